@@ -0,0 +1,353 @@
+# api.py
+from flask import Blueprint, Response, jsonify, redirect, request, stream_with_context, url_for
+from flask_login import current_user
+from sqlalchemy import func, select
+from sqlalchemy.orm import aliased, contains_eager, joinedload
+from functools import wraps
+from models import db, User, Post, Comment, CategoryStats, POST_MODELS, get_comment_counts, get_user_stats
+from pagination import keyset_paginate, parse_date_param
+from search_index import search_posts, SEARCH_RESULT_CAP
+from db_config import use_replica
+import base64
+import binascii
+import json
+import time
+
+# Read-only JSON views of the forum, for consumers that would otherwise scrape
+# the HTML. Rate limits for both blueprints are attached in app.py.
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+# Bulk export lives on its own blueprint so it can carry a much tighter limit
+api_export = Blueprint('api_export', __name__, url_prefix='/api/v1')
+
+API_MAX_LIMIT = 100
+EXPORT_BATCH_SIZE = 1000
+FEED_POLL_INTERVAL = 1.0  # seconds between checks for new rows while a feed request waits
+FEED_MAX_WAIT = 30  # longest long-poll, in seconds
+FEED_STREAM_SECONDS = 300  # an SSE stream ends after this long; clients reconnect with Last-Event-ID
+FEED_KEEPALIVE = 15  # seconds of silence before an SSE comment line keeps proxies from timing out
+
+
+def api_login_required(view):
+    """Like login_required, but answers 401 JSON instead of redirecting to the login page."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return jsonify(error='login required'), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def page_limit(default=20):
+    return max(1, min(request.args.get('limit', default, type=int), API_MAX_LIMIT))
+
+
+def date_range():
+    return parse_date_param(request.args.get('since')), parse_date_param(request.args.get('until'), end=True)
+
+
+def filter_posts(query, post_type=None, category=None, since=None, until=None, model=Post):
+    if post_type:
+        query = query.filter(model.post_type == post_type)
+    if category:
+        query = query.filter(model.category == category)
+    if since is not None:
+        query = query.filter(model.date >= since)
+    if until is not None:
+        query = query.filter(model.date < until)
+    return query
+
+
+def post_json(post, comment_count=None):
+    data = {
+        'id': post.id,
+        'post_type': post.post_type,
+        'category': post.category,
+        'title': post.title,
+        'body': post.body,
+        'price': post.price,
+        'author': post.author.username,
+        'date': post.date.isoformat() if post.date else None
+    }
+    if comment_count is not None:
+        data['comments'] = comment_count
+    return data
+
+
+def posts_json(posts, with_comments=True):
+    counts = get_comment_counts([post.id for post in posts]) if with_comments else {}
+    return [post_json(post, counts.get(post.id, 0) if with_comments else None) for post in posts]
+
+
+def comment_json(comment):
+    return {
+        'id': comment.id,
+        'post_id': comment.post_id,
+        'post_type': comment.post.post_type,
+        'author': comment.author.username,
+        'content': comment.content,
+        'date': comment.date.isoformat() if comment.date else None
+    }
+
+
+@api.route('/categories')
+@use_replica
+def categories():
+    counts = {post_type: {} for post_type in POST_MODELS}
+    for stat in CategoryStats.query.all():
+        counts.setdefault(stat.post_type, {})[stat.category] = stat.count
+    return jsonify(categories=counts)
+
+
+@api.route('/categories/<post_type>/<category>')
+@use_replica
+def category_posts(post_type, category):
+    """Newest posts first; follow next_cursor with ?after= to walk the whole category."""
+    if post_type not in POST_MODELS:
+        return jsonify(error='unknown post type'), 404
+    since, until = date_range()
+    query = filter_posts(Post.query.options(joinedload(Post.author)), post_type, category, since, until)
+    page = keyset_paginate(query, Post, after=request.args.get('after'), before=request.args.get('before'), per_page=page_limit())
+    return jsonify(posts=posts_json(page.items), next_cursor=page.next_cursor, prev_cursor=page.prev_cursor)
+
+
+@api.route('/posts/<post_type>/<int:post_id>')
+@api_login_required
+def post(post_type, post_id):
+    found = Post.query.options(joinedload(Post.author)).filter_by(id=post_id, post_type=post_type).first()
+    if found is None:
+        legacy = Post.query.filter_by(post_type=post_type, legacy_id=post_id).first()
+        if legacy is None:
+            return jsonify(error='post not found'), 404
+        return redirect(url_for('api.post', post_type=post_type, post_id=legacy.id), 301)
+    return jsonify(post=post_json(found, get_comment_counts([found.id]).get(found.id, 0)))
+
+
+@api.route('/posts/<post_type>/<int:post_id>/comments')
+@api_login_required
+def post_comments(post_type, post_id):
+    if not db.session.query(Post.query.filter_by(id=post_id, post_type=post_type).exists()).scalar():
+        return jsonify(error='post not found'), 404
+    page = max(request.args.get('page', 1, type=int), 1)
+    comments = Comment.query.options(joinedload(Comment.author)).filter_by(post_id=post_id).order_by(
+        Comment.date.desc(), Comment.id.desc()).paginate(page=page, per_page=page_limit(), error_out=False, count=False)
+    return jsonify(comments=[comment_json(comment) for comment in comments.items], page=page, has_next=comments.has_next)
+
+
+@api.route('/users/<username>')
+@api_login_required
+def user_profile(username):
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        return jsonify(error='user not found'), 404
+    query = Post.query.options(joinedload(Post.author)).filter_by(user_id=user.id)
+    page = keyset_paginate(query, Post, after=request.args.get('after', ''), before=request.args.get('before'), per_page=page_limit())
+    stats = get_user_stats(user.id)
+    return jsonify(
+        user={
+            'username': user.username,
+            'avatar': user.avatar,
+            'post_count': stats.post_count if stats else 0,
+            'comment_count': stats.comments if stats else 0,
+            'last_post_at': stats.last_post_at.isoformat() if stats and stats.last_post_at else None
+        },
+        posts=posts_json(page.items),
+        next_cursor=page.next_cursor,
+        prev_cursor=page.prev_cursor
+    )
+
+
+@api.route('/search')
+@api_login_required
+@use_replica
+def search():
+    query = request.args.get('query', '')
+    post_type = request.args.get('type', '')
+    page = max(request.args.get('page', 1, type=int), 1)
+    since, until = date_range()
+    matches, total = search_posts(query, post_type, page=page, per_page=page_limit(), since=since, until=until)
+    rows = Post.query.options(joinedload(Post.author)).filter(Post.id.in_(matches)).all() if matches else []
+    loaded = {post.id: post for post in rows}
+    posts = [loaded[post_id] for post_id in matches if post_id in loaded]
+    return jsonify(posts=posts_json(posts, with_comments=False), page=page, total=total, capped=total >= SEARCH_RESULT_CAP)
+
+
+@api_export.route('/export')
+@api_login_required
+@use_replica
+def export():
+    """Stream matching posts as NDJSON, oldest first, one line per post.
+
+    Rows come off a server-side cursor in batches of EXPORT_BATCH_SIZE, so
+    memory stays flat however many posts match. Filters: type, category,
+    since, until.
+    """
+    post_type = request.args.get('type') or None
+    if post_type is not None and post_type not in POST_MODELS:
+        return jsonify(error='unknown post type'), 404
+    since, until = date_range()
+    statement = filter_posts(
+        select(Post.id, Post.post_type, Post.category, Post.title, Post.body, Post.price, User.username, Post.date).join(User),
+        post_type, request.args.get('category') or None, since, until
+    ).order_by(Post.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    def generate():
+        for row in db.session.execute(statement):
+            yield json.dumps({
+                'id': row.id,
+                'post_type': row.post_type,
+                'category': row.category,
+                'title': row.title,
+                'body': row.body,
+                'price': row.price,
+                'author': row.username,
+                'date': row.date.isoformat() if row.date else None
+            }) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': 'attachment; filename=posts.ndjson'})
+
+
+# The change feed pages by id, which assumes rows become visible in id order. SQLite
+# serializes writers, so they do. On PostgreSQL ids are handed out by a sequence at insert
+# time, not at commit: a transaction holding a lower id can commit after a reader's cursor
+# has moved past a higher one, and that row is never delivered. Consumers there that must
+# see every row should reconcile now and then with the export endpoint.
+def encode_feed_cursor(post_id, comment_id):
+    """Encode the change feed high-water marks (last post id, last comment id) as an opaque cursor."""
+    raw = json.dumps([post_id, comment_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_feed_cursor(cursor):
+    """Decode a change feed cursor, or return None if it is empty or malformed."""
+    if not cursor:
+        return None
+    try:
+        post_id, comment_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError, TypeError):
+        return None
+    if not isinstance(post_id, int) or not isinstance(comment_id, int):
+        return None
+    return post_id, comment_id
+
+
+def feed_head():
+    """Highest post and comment ids, read off the primary keys in one round trip."""
+    post_id, comment_id = db.session.execute(
+        select(select(func.max(Post.id)).scalar_subquery(), select(func.max(Comment.id)).scalar_subquery())
+    ).one()
+    return post_id or 0, comment_id or 0
+
+
+def feed_moved(head, cursor):
+    return head[0] > cursor[0] or head[1] > cursor[1]
+
+
+def fetch_changes(cursor, head, post_type=None, category=None, limit=API_MAX_LIMIT):
+    """Posts and comments with ids in (cursor, head], oldest first, at most `limit` of each.
+
+    Both scans walk an id range in id order: posts on the primary key or, when
+    filtered, on the (post_type, [category,] id) indexes; comments always on
+    the primary key, testing each comment's post by key. Returns (events, next
+    cursor), where each event is (kind, data, cursor after the event). Once a
+    scan is exhausted, its mark moves straight to head, so filtered-out rows
+    are never rescanned.
+    """
+    post_mark, comment_mark = cursor
+    posts = filter_posts(
+        Post.query.options(joinedload(Post.author)).filter(Post.id > post_mark, Post.id <= head[0]), post_type, category
+    ).order_by(Post.id).limit(limit).all()
+    comments = Comment.query.join(Comment.post).options(contains_eager(Comment.post), joinedload(Comment.author)).filter(
+        Comment.id > comment_mark, Comment.id <= head[1]
+    )
+    if post_type or category:
+        # Filtering the joined post directly lets the planner start from every post in the
+        # category and sort all their comments; a per-comment EXISTS keeps the id range scan
+        matching = aliased(Post)
+        comments = comments.filter(
+            filter_posts(select(matching.id).where(matching.id == Comment.post_id), post_type, category, model=matching).exists()
+        )
+    comments = comments.order_by(Comment.id).limit(limit).all()
+    events = [('post', post_json(post), (post.id, comment_mark)) for post in posts]
+    post_mark = posts[-1].id if len(posts) == limit else head[0]
+    events += [('comment', comment_json(comment), (post_mark, comment.id)) for comment in comments]
+    comment_mark = comments[-1].id if len(comments) == limit else head[1]
+    return events, (post_mark, comment_mark)
+
+
+def feed_params():
+    post_type = request.args.get('type') or None
+    category = request.args.get('category') or None
+    cursor = decode_feed_cursor(request.args.get('cursor') or request.headers.get('Last-Event-ID'))
+    return post_type, category, cursor
+
+
+@api.route('/changes')
+@api_login_required
+def changes():
+    """New posts and comments since `cursor`; without one, the feed starts at the current head.
+
+    With `wait=N` (up to FEED_MAX_WAIT seconds) an empty poll holds the request
+    open until something arrives, checking the id high-water marks every
+    FEED_POLL_INTERVAL.
+    """
+    post_type, category, cursor = feed_params()
+    if post_type is not None and post_type not in POST_MODELS:
+        return jsonify(error='unknown post type'), 404
+    deadline = time.monotonic() + max(0, min(request.args.get('wait', 0, type=float), FEED_MAX_WAIT))
+    head = feed_head()
+    if cursor is None:
+        cursor = head
+    while True:
+        events, next_cursor = fetch_changes(cursor, head, post_type, category, page_limit(API_MAX_LIMIT))
+        if events or time.monotonic() >= deadline:
+            break
+        cursor = next_cursor
+        while not feed_moved(head, cursor) and time.monotonic() < deadline:
+            # End the read transaction so the next check sees rows committed since
+            db.session.rollback()
+            time.sleep(FEED_POLL_INTERVAL)
+            head = feed_head()
+    return jsonify(
+        items=[dict(data, kind=kind) for kind, data, _ in events],
+        cursor=encode_feed_cursor(*next_cursor)
+    )
+
+
+@api.route('/changes/stream')
+@api_login_required
+def changes_stream():
+    """The change feed as Server-Sent Events: one `post` or `comment` event per new row.
+
+    Each event's id is a feed cursor, so a reconnecting EventSource resumes
+    exactly where it stopped via Last-Event-ID. The stream closes after
+    FEED_STREAM_SECONDS to free the worker, and it gives its database
+    connection back to the pool between checks.
+    """
+    post_type, category, cursor = feed_params()
+    if post_type is not None and post_type not in POST_MODELS:
+        return jsonify(error='unknown post type'), 404
+    if cursor is None:
+        cursor = feed_head()
+
+    def generate(cursor):
+        deadline = time.monotonic() + FEED_STREAM_SECONDS
+        last_sent = time.monotonic()
+        yield f"retry: {int(FEED_POLL_INTERVAL * 2000)}\nid: {encode_feed_cursor(*cursor)}\n\n"
+        while time.monotonic() < deadline:
+            head = feed_head()
+            if feed_moved(head, cursor):
+                events, cursor = fetch_changes(cursor, head, post_type, category)
+                for kind, data, event_cursor in events:
+                    yield f"id: {encode_feed_cursor(*event_cursor)}\nevent: {kind}\ndata: {json.dumps(data)}\n\n"
+                if events:
+                    last_sent = time.monotonic()
+                    continue
+            if time.monotonic() - last_sent >= FEED_KEEPALIVE:
+                yield ': keepalive\n\n'
+                last_sent = time.monotonic()
+            db.session.close()
+            time.sleep(FEED_POLL_INTERVAL)
+
+    return Response(stream_with_context(generate(cursor)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
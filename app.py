@@ -1,52 +1,237 @@
 # app.py
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, Response, abort, render_template, request, redirect, url_for, flash, session, make_response, jsonify
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from flask_bcrypt import Bcrypt
-from models import db, User, Announcement, Marketplace, Service, Comment
-import string, random, os
+from password_hashing import PasswordHasher, HashingBusy
+from db_config import configure_database, use_replica
+from models import (
+    db, User, Post, Comment, CategoryStats, CaptchaChallenge, POST_MODELS, get_comment_counts, get_post_version, get_user_stats,
+    rebuild_category_stats, rebuild_user_stats
+)
+from migrations import upgrade_db
+from pagination import keyset_paginate, parse_date_param
+from search_index import search_posts, rebuild_search_index, SEARCH_RESULT_CAP
+from sqlalchemy import delete, event, func, inspect, select
+from sqlalchemy.orm import Session, joinedload
+import string, random, os, math, time
+import click
 from captcha.image import ImageCaptcha
-from datetime import datetime
+from captcha_pool import CaptchaPool
+from fragment_cache import FragmentCache
+from user_cache import UserCache
+from instrumentation import Instrumentation
+from markupsafe import Markup
+import hashlib
+import hmac
+import secrets
+from datetime import datetime, timezone
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+import ratelimit_storage  # registers the sqlite:// rate limit storage
+from api import api, api_export
 
 
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///database.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+configure_database(app)
+# Opt-in profiling: per-route latency, SQL, template and CAPTCHA/bcrypt timings at /metrics,
+# plus a warning log line with the breakdown for requests slower than SLOW_REQUEST_MS.
+# SERVER_TIMING=1 also reports each response's SQL count and time in a Server-Timing header.
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+instrumentation = Instrumentation(
+    enabled=os.environ.get('INSTRUMENTATION', '0') == '1',
+    slow_request_ms=float(os.environ['SLOW_REQUEST_MS']) if os.environ.get('SLOW_REQUEST_MS') else None,
+    server_timing=os.environ.get('SERVER_TIMING', '0') == '1'
+)
+instrumentation.init_app(app, db)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
-db.init_app(app)
-bcrypt = Bcrypt(app)
+# bcrypt runs in a process pool; tune the work factor and pool per environment
+app.config['BCRYPT_LOG_ROUNDS'] = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+app.config['PASSWORD_HASH_QUEUE'] = int(os.environ.get('PASSWORD_HASH_QUEUE', 32))
+app.config['PASSWORD_HASH_TIMEOUT'] = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+password_hasher = PasswordHasher(
+    rounds=app.config['BCRYPT_LOG_ROUNDS'],
+    workers=app.config['PASSWORD_HASH_WORKERS'],
+    max_pending=app.config['PASSWORD_HASH_QUEUE'],
+    timeout=app.config['PASSWORD_HASH_TIMEOUT']
+)
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
 
+# Rate limit counters live in a SQLite file by default so every gunicorn worker
+# shares them; set RATELIMIT_STORAGE_URI (e.g. memory://) to override.
+app.config['RATELIMIT_STORAGE_URI'] = os.environ.get(
+    'RATELIMIT_STORAGE_URI', 'sqlite:///' + os.path.join(app.instance_path, 'ratelimits.db')
+)
+# Load tests switch limits off with RATELIMIT_ENABLED=0
+app.config['RATELIMIT_ENABLED'] = os.environ.get('RATELIMIT_ENABLED', '1') == '1'
+
 limiter = Limiter(
     get_remote_address,
     app=app,
     default_limits=["500 per day", "200 per hour"],
-    storage_uri="memory://"
+    storage_uri=app.config['RATELIMIT_STORAGE_URI']
 )
 
+# JSON API: the same login rules as the HTML pages, with its own per-minute budget on top
+# of the default limits, and a much tighter one for bulk exports
+limiter.limit(os.environ.get('API_RATE_LIMIT', '30 per minute'), override_defaults=False)(api)
+limiter.limit(os.environ.get('EXPORT_RATE_LIMIT', '5 per hour'), override_defaults=False)(api_export)
+app.register_blueprint(api)
+app.register_blueprint(api_export)
+
 @app.errorhandler(429)
 def ratelimit_handler(e):
+    if request.blueprint in ('api', 'api_export'):
+        return jsonify(error='rate limit exceeded', limit=str(e.description)), 429
     return render_template("429.html"), 429
 
 
+# Read-only user snapshots for the login loader and author names, so an authenticated
+# page view does not query the user table; a flush that changes a user drops its entry
+user_cache = UserCache(
+    maxsize=int(os.environ.get('USER_CACHE_SIZE', 10000)),
+    ttl=int(os.environ.get('USER_CACHE_TTL', 300))
+)
+event.listen(Session, 'after_flush', user_cache.invalidate_flushed)
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return user_cache.get(int(user_id))
+
+# Rendered fragments of category and post pages, validated against CategoryStats stamps
+fragment_cache = FragmentCache(
+    maxsize=int(os.environ.get('FRAGMENT_CACHE_SIZE', 1000)),
+    ttl=int(os.environ.get('FRAGMENT_CACHE_TTL', 300))
+)
 
 # CAPTCHA configuration
 CAPTCHA_LENGTH = 6
 CAPTCHA_CHARS = string.ascii_uppercase + string.digits
+CAPTCHA_POOL_SIZE = 50
+CAPTCHA_TTL = 300  # seconds a challenge stays valid
 image_captcha = ImageCaptcha(fonts=['fonts/DejaVuSans.ttf'], width=200, height=60)
+captcha_pool = CaptchaPool(image_captcha, CAPTCHA_CHARS, CAPTCHA_LENGTH, size=CAPTCHA_POOL_SIZE, ttl=CAPTCHA_TTL,
+                           janitor_dir=os.path.join('static', 'captchas'))
+instrumentation.register_gauges('captcha_pool', captcha_pool.stats)
+instrumentation.register_gauges('fragment_cache', fragment_cache.stats)
+instrumentation.register_gauges('user_cache', user_cache.stats)
 
 def generate_captcha():
-    """Generate an 6-character CAPTCHA and image."""
-    code = ''.join(random.choice(CAPTCHA_CHARS) for _ in range(CAPTCHA_LENGTH))
-    random_name = ''.join(random.choice(string.ascii_lowercase) for _ in range(10))
-    image_path = os.path.join('static', 'captchas', f'captcha_{random_name}.png')
-    image_captcha.write(code, image_path)
-    return code, image_path
+    """Issue a 6-character CAPTCHA from the pre-rendered pool.
+
+    The answer stays in the database; Flask's session cookie is signed but
+    readable, so it only gets the challenge's random id.
+    """
+    with instrumentation.timer('captcha_issue'):
+        code = captcha_pool.take()
+    now = time.time()
+    challenge_id = secrets.token_urlsafe(16)
+    db.session.execute(delete(CaptchaChallenge).where(CaptchaChallenge.expires_at < now))
+    db.session.add(CaptchaChallenge(id=challenge_id, code=code, expires_at=now + CAPTCHA_TTL))
+    db.session.commit()
+    session['captcha_id'] = challenge_id
+    return code
+
+
+def current_captcha():
+    """The code of the session's CAPTCHA, or None if it has none or it has expired."""
+    challenge_id = session.get('captcha_id')
+    challenge = db.session.get(CaptchaChallenge, challenge_id) if challenge_id else None
+    if challenge is None or challenge.expires_at < time.time():
+        return None
+    return challenge.code
+
+
+def check_captcha(answer):
+    """Check an answer against the session's CAPTCHA, using the challenge up either way.
+
+    The row is deleted and read back in one statement, so two requests racing
+    with the same session cannot both get a match.
+    """
+    challenge_id = session.pop('captcha_id', None)
+    if not challenge_id:
+        return False
+    challenge = db.session.execute(
+        delete(CaptchaChallenge).where(CaptchaChallenge.id == challenge_id).returning(CaptchaChallenge.code, CaptchaChallenge.expires_at)
+    ).first()
+    db.session.commit()
+    if challenge is None:
+        return False
+    captcha_pool.discard(challenge.code)
+    return challenge.expires_at >= time.time() and hmac.compare_digest(answer.encode(), challenge.code.encode())
+
+
+@app.route('/captcha.png')
+def captcha_image():
+    code = current_captcha()
+    if not code:
+        return render_template('404.html'), 404
+    response = make_response(captcha_pool.image_for(code))
+    response.headers['Content-Type'] = 'image/png'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@app.route('/metrics/captcha')
+@login_required
+def captcha_metrics():
+    return jsonify(captcha_pool.stats())
+
+
+@app.route('/metrics/cache')
+@login_required
+def cache_metrics():
+    return jsonify(fragment_cache.stats())
+
+
+@app.route('/metrics')
+@limiter.exempt
+def metrics():
+    """Prometheus scrape endpoint: needs `Authorization: Bearer $METRICS_TOKEN`, or a login when no token is set."""
+    if not instrumentation.enabled:
+        return render_template('404.html'), 404
+    token = app.config['METRICS_TOKEN']
+    if token:
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+            return Response('unauthorized\n', status=401, mimetype='text/plain')
+    elif not current_user.is_authenticated:
+        return login_manager.unauthorized()
+    return Response(instrumentation.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/health')
+@limiter.exempt
+def health():
+    """Liveness: the process is up and serving. Touches nothing else."""
+    return jsonify(status='ok')
+
+
+@app.route('/ready')
+@limiter.exempt
+def ready():
+    """Readiness: 200 once the database answers and this process's CAPTCHA pool has challenges ready."""
+    captcha_pool.warm()
+    started = time.perf_counter()
+    try:
+        db.session.execute(select(User.id).limit(1))
+        database = {'ok': True}
+    except Exception as e:
+        db.session.rollback()
+        app.logger.warning(f"Readiness check: database unavailable: {e}")
+        database = {'ok': False}
+    database['latency_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    caches = {
+        'captcha_pool': captcha_pool.stats()['pool_size'],
+        'fragment_cache': fragment_cache.stats()['entries'],
+        'user_cache': user_cache.stats()['entries'],
+    }
+    if not database['ok']:
+        status = 'unavailable'
+    elif not caches['captcha_pool']:
+        status = 'warming'
+    else:
+        status = 'ok'
+    return jsonify(status=status, database=database, caches=caches), 200 if status == 'ok' else 503
 
 
 @app.route('/logout')
@@ -56,100 +241,162 @@ def logout():
     return redirect(url_for('home'))
 
 
+def get_category_counts(*post_types):
+    """Read post counts for the given post types from the CategoryStats counters."""
+    category_counts = {post_type: {} for post_type in post_types}
+    stats = CategoryStats.query.filter(CategoryStats.post_type.in_(post_types)).all()
+    for stat in stats:
+        category_counts[stat.post_type][stat.category] = stat.count
+    return category_counts
+
+
+def get_category_stats(post_type, category):
+    """Counter row for one category (post total and last-write stamp), or None."""
+    return db.session.get(CategoryStats, (post_type, category))
+
+
+def date_range_args():
+    """(since, until, raw query args to carry over into pagination links) for the current request."""
+    raw = {name: request.args[name] for name in ('since', 'until') if request.args.get(name)}
+    return parse_date_param(raw.get('since')), parse_date_param(raw.get('until'), end=True), raw
+
+
+def conditional_page(key, version, render):
+    """Answer with 304 when the client already has this version of the page, else render it.
+
+    The ETag covers the page key, its content version and the viewer (the nav
+    bar differs per user). Last-Modified is the version's write stamp in whole
+    seconds, so If-Modified-Since alone only gets a 304 when the exact version
+    is no newer than it; a write later in the same second is never hidden.
+    """
+    etag = hashlib.sha1(repr((key, version, current_user.get_id())).encode('utf-8')).hexdigest()
+    last_modified = datetime.fromtimestamp(int(version or 0), timezone.utc)
+    if request.if_none_match:
+        # If-Modified-Since is ignored when If-None-Match is sent (RFC 9110, 13.1.3)
+        unchanged = request.if_none_match.contains(etag)
+    else:
+        unchanged = bool(version) and request.if_modified_since is not None and version <= request.if_modified_since.timestamp()
+    if unchanged:
+        fragment_cache.record_not_modified()
+        response = make_response('', 304)
+    else:
+        response = make_response(render())
+    response.set_etag(etag)
+    if version:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def build_post_dicts(posts, with_username=True, with_post_type=False, with_comments=True):
+    """Turn posts into the dicts listing templates consume, batching the comment counts."""
+    comment_counts = get_comment_counts([post.id for post in posts]) if with_comments else {}
+    authors = user_cache.get_many([post.user_id for post in posts]) if with_username else {}
+    results = []
+    for post in posts:
+        data = {
+            'id': post.id,
+            'category': post.category,
+            'title': post.title
+        }
+        if post.post_type == 'announcements':
+            data['content'] = post.body
+        else:
+            data['description'] = post.body
+            data['price'] = post.price
+        if with_username:
+            author = authors.get(post.user_id)
+            data['username'] = author.username if author else None
+        if with_post_type:
+            data['post_type'] = post.post_type
+        data['date'] = post.date
+        if with_comments:
+            data['comments'] = comment_counts.get(post.id, 0)
+        results.append(data)
+    return results
+
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Recompute category and per-user counters from scratch."""
+    db.create_all()
+    rebuild_category_stats()
+    rebuild_user_stats()
+    click.echo('Category and user counters rebuilt.')
+
+
+@app.cli.command('init')
+@click.option('--posts-per-category', type=int, default=None, help='seeding scale for a new database')
+def init_command(posts_per_category):
+    """Create or upgrade the schema, and seed the database only if it has no users yet.
+
+    Safe to run on every start: an existing database keeps its data. A seeding
+    error is raised, so the command (and the container entrypoint) exits non-zero.
+    """
+    if inspect(db.engine).has_table('user') and db.session.execute(select(User.id).limit(1)).first() is not None:
+        created = upgrade_db()
+        click.echo(f"Database ready, existing data kept ({len(created)} indexes created).")
+        return
+    db.session.close()
+    from populate_db import init_db, password_hasher, NUM_POSTS_PER_CATEGORY
+    try:
+        init_db(num_posts=posts_per_category or NUM_POSTS_PER_CATEGORY)
+    finally:
+        password_hasher.shutdown()
+    click.echo('Database created and seeded.')
+
+
+@app.cli.command('migrate')
+def migrate_command():
+    """Upgrade the database schema in place, keeping existing data."""
+    created = upgrade_db()
+    click.echo(f"Database upgraded ({len(created)} indexes created).")
+
+
+@app.cli.command('reindex-search')
+def reindex_search_command():
+    """Rebuild the full-text search index from the post tables."""
+    db.create_all()
+    total = rebuild_search_index()
+    click.echo(f"Search index rebuilt with {total} posts.")
+
+
 # Routes for pages
 @app.route('/')
 def home():
     # Fetch category counts
-    category_counts = {
-        'announcements': {
-            'Announcements': Announcement.query.filter_by(category='Announcements').count(),
-            'General': Announcement.query.filter_by(category='General').count(),
-            'MM Service': Announcement.query.filter_by(category='MM Service').count()
-        },
-        'marketplace': {
-            'Buyers': Marketplace.query.filter_by(category='Buyers').count(),
-            'Sellers': Marketplace.query.filter_by(category='Sellers').count()
-        },
-        'services': {
-            'Buy': Service.query.filter_by(category='Buy').count(),
-            'Sell': Service.query.filter_by(category='Sell').count()
-        }
-    }
+    category_counts = get_category_counts('announcements', 'marketplace', 'services')
     return render_template('home.html', category_counts=category_counts)
 
 @app.route('/marketplace')
 def marketplace():
     # Fetch marketplace category counts
-    category_counts = {
-        'marketplace': {
-            'Buyers': Marketplace.query.filter_by(category='Buyers').count(),
-            'Sellers': Marketplace.query.filter_by(category='Sellers').count()
-        }
-    }
+    category_counts = get_category_counts('marketplace')
     return render_template('marketplace.html', category_counts=category_counts)
 
 @app.route('/services')
 def services():
     # Fetch services category counts
-    category_counts = {
-        'services': {
-            'Buy': Service.query.filter_by(category='Buy').count(),
-            'Sell': Service.query.filter_by(category='Sell').count()
-        }
-    }
+    category_counts = get_category_counts('services')
     return render_template('services.html', category_counts=category_counts)
 
 @app.route('/search', methods=['GET'])
 @login_required
+@use_replica
 def search():
     query = request.args.get('query', '')
     post_type = request.args.get('type', '')
-    posts = []
-    if post_type == '' or post_type == 'announcements':
-        announcements = Announcement.query.filter(
-            (Announcement.title.ilike(f'%{query}%')) |
-            (Announcement.content.ilike(f'%{query}%'))
-        ).all()
-        posts.extend([{
-            'id': post.id,
-            'category': post.category,
-            'title': post.title,
-            'content': post.content,
-            'username': post.author.username,
-            'date': post.date,
-            'post_type': 'announcements'
-        } for post in announcements])
-    if post_type == '' or post_type == 'marketplace':
-        marketplace = Marketplace.query.filter(
-            (Marketplace.title.ilike(f'%{query}%')) |
-            (Marketplace.description.ilike(f'%{query}%'))
-        ).all()
-        posts.extend([{
-            'id': post.id,
-            'category': post.category,
-            'title': post.title,
-            'description': post.description,
-            'username': post.author.username,
-            'price': post.price,
-            'date': post.date,
-            'post_type': 'marketplace'
-        } for post in marketplace])
-    if post_type == '' or post_type == 'services':
-        services = Service.query.filter(
-            (Service.title.ilike(f'%{query}%')) |
-            (Service.description.ilike(f'%{query}%'))
-        ).all()
-        posts.extend([{
-            'id': post.id,
-            'category': post.category,
-            'title': post.title,
-            'description': post.description,
-            'username': post.author.username,
-            'price': post.price,
-            'date': post.date,
-            'post_type': 'services'
-        } for post in services])
-    return render_template('search.html', posts=posts, query=query, post_type=post_type)
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = 20
+    since, until, date_args = date_range_args()
+    matches, total = search_posts(query, post_type, page=page, per_page=per_page, since=since, until=until)
+    # Load the matched rows in one query, then restore the ranked order
+    rows = Post.query.filter(Post.id.in_(matches)).all() if matches else []
+    loaded = {post['id']: post for post in build_post_dicts(rows, with_post_type=True, with_comments=False)}
+    posts = [loaded[post_id] for post_id in matches if post_id in loaded]
+    total_pages = math.ceil(total / per_page)
+    return render_template('search.html', posts=posts, query=query, post_type=post_type, page=page, total_pages=total_pages,
+                           total=total, capped=total >= SEARCH_RESULT_CAP, date_args=date_args)
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -157,40 +404,33 @@ def login():
         return redirect(url_for('home'))
     
     if request.method == 'GET':
-        captcha_code, captcha_image = generate_captcha()
-        session['captcha'] = captcha_code
-        session['captcha_image'] = captcha_image
-        return render_template('login.html', captcha_image=captcha_image)
+        generate_captcha()
+        return render_template('login.html', captcha_nonce=random.getrandbits(32))
     
     username = request.form['username']
     password = request.form['password']
     captcha_input = request.form['captcha'].strip().upper()
     
-    if captcha_input != session.get('captcha'):
+    if not check_captcha(captcha_input):
         flash('Invalid CAPTCHA', 'danger')
-        captcha_code, captcha_image = generate_captcha()
-        session['captcha'] = captcha_code
-        session['captcha_image'] = captcha_image
-        return render_template('login.html', captcha_image=captcha_image)
+        generate_captcha()
+        return render_template('login.html', captcha_nonce=random.getrandbits(32))
     
     user = User.query.filter_by(username=username).first()
-    if user and bcrypt.check_password_hash(user.password, password):
+    try:
+        with instrumentation.timer('bcrypt_check'):
+            password_ok = user is not None and password_hasher.check(user.password, password)
+    except HashingBusy:
+        flash('The server is busy, please try again', 'danger')
+        generate_captcha()
+        return render_template('login.html', captcha_nonce=random.getrandbits(32))
+    if password_ok:
         login_user(user)
-        captcha_image = session.get('captcha_image')
-        session.pop('captcha', None)
-        session.pop('captcha_image', None)
-        if captcha_image:
-            try:
-                os.remove(captcha_image)
-            except OSError as e:
-                print(f"Error deleting CAPTCHA image: {e}")
         return redirect(url_for('home'))
     
     flash('Invalid username or password', 'danger')
-    captcha_code, captcha_image = generate_captcha()
-    session['captcha'] = captcha_code
-    session['captcha_image'] = captcha_image
-    return render_template('login.html', captcha_image=captcha_image)
+    generate_captcha()
+    return render_template('login.html', captcha_nonce=random.getrandbits(32))
 
 @app.route('/register', methods=['GET', 'POST'])
 def register():
@@ -206,7 +446,12 @@ def register():
         if User.query.filter_by(username=username).first():
             flash('Username already taken', 'danger')
             return render_template('register.html')
-        hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+        try:
+            with instrumentation.timer('bcrypt_hash'):
+                hashed_password = password_hasher.hash(password)
+        except HashingBusy:
+            flash('The server is busy, please try again', 'danger')
+            return render_template('register.html')
         user = User(username=username, password=hashed_password, avatar='default.jpg')
         db.session.add(user)
         db.session.commit()
@@ -215,116 +460,116 @@ def register():
     return render_template('register.html')
 
 @app.route('/category/<post_type>/<category>')
+@use_replica
 def category(post_type, category):
     page = request.args.get('page', 1, type=int)
     per_page = 10
-    posts = []
-    total_pages = 0
-    if post_type == 'announcements':
-        pagination = Announcement.query.filter_by(category=category).order_by(Announcement.date.desc()).paginate(page=page, per_page=per_page, error_out=False)
-        posts = [{
-            'id': post.id,
-            'category': post.category,
-            'title': post.title,
-            'content': post.content,
-            'username': post.author.username,
-            'date': post.date,
-            'comments': Comment.query.filter_by(post_type='announcement', post_id=post.id).count()
-        } for post in pagination.items]
-        total_pages = pagination.pages
-    elif post_type == 'marketplace':
-        pagination = Marketplace.query.filter_by(category=category).order_by(Marketplace.date.desc()).paginate(page=page, per_page=per_page, error_out=False)
-        posts = [{
-            'id': post.id,
-            'category': post.category,
-            'title': post.title,
-            'description': post.description,
-            'username': post.author.username,
-            'price': post.price,
-            'date': post.date,
-            'comments': Comment.query.filter_by(post_type='marketplace', post_id=post.id).count()
-        } for post in pagination.items]
-        total_pages = pagination.pages
-    elif post_type == 'services':
-        pagination = Service.query.filter_by(category=category).order_by(Service.date.desc()).paginate(page=page, per_page=per_page, error_out=False)
-        posts = [{
-            'id': post.id,
-            'category': post.category,
-            'title': post.title,
-            'description': post.description,
-            'username': post.author.username,
-            'price': post.price,
-            'date': post.date,
-            'comments': Comment.query.filter_by(post_type='service', post_id=post.id).count()
-        } for post in pagination.items]
-        total_pages = pagination.pages
-    else:
+    # Passing `after` (empty for the first page) or `before` opts into cursor pagination
+    after = request.args.get('after')
+    before = request.args.get('before')
+    # since/until narrow the listing to a date range on the (post_type, category, date) index
+    since, until, date_args = date_range_args()
+    if post_type not in POST_MODELS:
         return render_template('404.html'), 404
-    return render_template('category.html', post_type=post_type, category=category, page=page, posts=posts, total_pages=total_pages)
+    stats = get_category_stats(post_type, category)
+    version = stats.updated_at if stats else 0.0
+    key = ('category', post_type, category, page, after, before, since, until)
+
+    def render_body():
+        cached = fragment_cache.get(key, version)
+        if cached:
+            return cached[0]
+        model = POST_MODELS[post_type]
+        query = model.query.filter_by(category=category)
+        if since is not None:
+            query = query.filter(model.date >= since)
+        if until is not None:
+            query = query.filter(model.date < until)
+        if since is None and until is None:
+            total = stats.count if stats else 0
+        else:
+            total = query.with_entities(func.count(model.id)).scalar()
+        total_pages = math.ceil(total / per_page)
+        if after is not None or before is not None:
+            keyset = keyset_paginate(query, model, after=after, before=before, per_page=per_page)
+            posts = build_post_dicts(keyset.items)
+            body = render_template('category_body.html', post_type=post_type, category=category, page=None, posts=posts, total_pages=total_pages,
+                                   next_cursor=keyset.next_cursor, prev_cursor=keyset.prev_cursor, date_args=date_args)
+        else:
+            pagination = query.order_by(model.date.desc(), model.id.desc()).paginate(page=page, per_page=per_page, error_out=False, count=False)
+            posts = build_post_dicts(pagination.items)
+            body = render_template('category_body.html', post_type=post_type, category=category, page=page, posts=posts, total_pages=total_pages,
+                                   date_args=date_args)
+        body = Markup(body)
+        fragment_cache.set(key, body, version)
+        return body
+
+    if session.get('_flashes'):
+        return render_template('category.html', category=category, body=render_body())
+    return conditional_page(key, version, lambda: render_template('category.html', category=category, body=render_body()))
 
 @app.route('/post/<post_type>/<int:post_id>')
 @limiter.limit("30 per minute")
 @login_required
 def post_detail(post_type, post_id):
-    if post_type not in ['announcements', 'marketplace', 'services']:
+    if post_type not in POST_MODELS:
         return render_template('404.html'), 404
-    post = None
-    comments = []
-    user = None
-    if post_type == 'announcements':
-        post = Announcement.query.get_or_404(post_id)
-        comments = Comment.query.filter_by(post_type='announcement', post_id=post_id).order_by(Comment.date.desc()).all()
-        user = User.query.get_or_404(post.user_id)
-    elif post_type == 'marketplace':
-        post = Marketplace.query.get_or_404(post_id)
-        comments = Comment.query.filter_by(post_type='marketplace', post_id=post_id).order_by(Comment.date.desc()).all()
-        user = User.query.get_or_404(post.user_id)
-    elif post_type == 'services':
-        post = Service.query.get_or_404(post_id)
-        comments = Comment.query.filter_by(post_type='service', post_id=post_id).order_by(Comment.date.desc()).all()
-        user = User.query.get_or_404(post.user_id)
-    post_count = len(user.announcements) + len(user.marketplace_posts) + len(user.services)
-    return render_template('post_detail.html', post_type=post_type, post=post, comments=comments, user=user, post_count=post_count)
+    # Comments come newest first, a capped page at a time; "load more" follows the cursor
+    comments_after = request.args.get('comments_after') or None
+    comments_per_page = 20
+    key = ('post', post_type, post_id, comments_after)
+    # A cached fragment is current until the post, its comments or its author's counters change
+    cached = fragment_cache.get(key, version=lambda meta: get_post_version(post_id))
+    if cached and not session.get('_flashes'):
+        body, meta, version = cached
+        return conditional_page(key, version, lambda: render_template('post_detail.html', title=meta['title'], body=body))
+    post = Post.query.filter_by(id=post_id, post_type=post_type).first()
+    if post is None:
+        # URLs from before the post tables were unified carry the old per-type id
+        legacy = Post.query.filter_by(post_type=post_type, legacy_id=post_id).first_or_404()
+        return redirect(url_for('post_detail', post_type=post_type, post_id=legacy.id), 301)
+    comments_query = Comment.query.options(joinedload(Comment.author)).filter_by(post_id=post_id)
+    comments = keyset_paginate(comments_query, Comment, after=comments_after or '', per_page=comments_per_page)
+    user = user_cache.get(post.user_id)
+    if user is None:
+        abort(404)
+    stats = get_user_stats(user.id)
+    post_count = stats.post_count if stats else 0
+    body = Markup(render_template('post_detail_body.html', post_type=post_type, post=post, comments=comments.items,
+                                  next_comments=comments.next_cursor, comments_after=comments_after, user=user, post_count=post_count))
+    version = max(post.updated_at, stats.updated_at if stats else 0.0)
+    fragment_cache.set(key, body, version, meta={'title': post.title})
+    return conditional_page(key, version, lambda: render_template('post_detail.html', title=post.title, body=body))
 
 @app.route('/profile/<username>')
 @login_required
 def profile_detail(username):
     user = User.query.filter_by(username=username).first_or_404()
-    post_count = len(user.announcements) + len(user.marketplace_posts) + len(user.services)
-    posts = []
-    for post in user.announcements:
-        posts.append({
-            'post_type': 'announcements',
-            'id': post.id,
-            'category': post.category,
-            'title': post.title,
-            'content': post.content,
-            'date': post.date,
-            'comments': Comment.query.filter_by(post_type='announcement', post_id=post.id).count()
-        })
-    for post in user.marketplace_posts:
-        posts.append({
-            'post_type': 'marketplace',
-            'id': post.id,
-            'category': post.category,
-            'title': post.title,
-            'description': post.description,
-            'price': post.price,
-            'date': post.date,
-            'comments': Comment.query.filter_by(post_type='marketplace', post_id=post.id).count()
-        })
-    for post in user.services:
-        posts.append({
-            'post_type': 'services',
-            'id': post.id,
-            'category': post.category,
-            'title': post.title,
-            'description': post.description,
-            'price': post.price,
-            'date': post.date,
-            'comments': Comment.query.filter_by(post_type='service', post_id=post.id).count()
-        })
-    return render_template('profile_detail.html', user=user, post_count=post_count, posts=posts)
+    page = max(request.args.get('page', 1, type=int), 1)
+    comments_page = max(request.args.get('comments_page', 1, type=int), 1)
+    per_page = 20
+    # Same cursor opt-in as category pages, walking the (user_id, date) index
+    after = request.args.get('after')
+    before = request.args.get('before')
+    stats = get_user_stats(user.id)
+    post_count = stats.post_count if stats else 0
+    total_pages = math.ceil(post_count / per_page)
+    query = Post.query.filter_by(user_id=user.id)
+    next_cursor = prev_cursor = None
+    if after is not None or before is not None:
+        keyset = keyset_paginate(query, Post, after=after, before=before, per_page=per_page)
+        user_posts, next_cursor, prev_cursor = keyset.items, keyset.next_cursor, keyset.prev_cursor
+        page = None
+    else:
+        user_posts = query.order_by(Post.date.desc(), Post.id.desc()).paginate(page=page, per_page=per_page, error_out=False, count=False).items
+    posts = build_post_dicts(user_posts, with_username=False, with_post_type=True)
+    comment_count = stats.comments if stats else 0
+    comment_pages = math.ceil(comment_count / per_page)
+    comments = Comment.query.options(joinedload(Comment.post)).filter_by(user_id=user.id).order_by(Comment.date.desc(), Comment.id.desc()).paginate(
+        page=comments_page, per_page=per_page, error_out=False, count=False).items
+    return render_template('profile_detail.html', user=user, stats=stats, post_count=post_count, posts=posts, page=page, total_pages=total_pages,
+                           next_cursor=next_cursor, prev_cursor=prev_cursor, after=after, before=before, comments=comments, comments_page=comments_page,
+                           comment_pages=comment_pages)
 
 if __name__ == '__main__':
     with app.app_context():
@@ -0,0 +1,121 @@
+# benchmarks/concurrency_check.py
+"""Read load from several web processes while the simulator writes to the same database.
+
+Seeds a temporary SQLite database with populate_db.py, starts
+sellers_simulator.py against it, and meanwhile has several processes request
+category, post and search pages through the Flask test client. It reports
+failed reads, read latency and the simulator's failed batches. With the
+shared db_config settings (WAL, busy_timeout) both failure counts should be 0.
+Run it with --journal-mode DELETE to compare against rollback journaling.
+tests/test_concurrency.py is the short version that runs with the test suite.
+
+    python benchmarks/concurrency_check.py --readers 4 --duration 20 --rate 200
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def reader(deadline, urls, results):
+    from app import app, limiter
+    from models import User
+    limiter.enabled = False
+    client = app.test_client()
+    with app.app_context():
+        user = User.query.first()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+        session['_fresh'] = True
+    latencies, failures, errors = [], 0, {}
+    while time.time() < deadline:
+        url = random.choice(urls)
+        began = time.perf_counter()
+        try:
+            status = client.get(url).status_code
+        except Exception as e:
+            status = 500
+            errors[str(e)[:80]] = errors.get(str(e)[:80], 0) + 1
+        latencies.append(time.perf_counter() - began)
+        if status >= 500:
+            failures += 1
+    results.put((latencies, failures, errors))
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readers', type=int, default=4, help='reader processes')
+    parser.add_argument('--duration', type=float, default=20, help='seconds of concurrent load')
+    parser.add_argument('--rate', type=float, default=200, help='simulator rows per second')
+    parser.add_argument('--posts-per-category', type=int, default=500)
+    parser.add_argument('--journal-mode', default='WAL', help='SQLITE_JOURNAL_MODE for every process')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, 'forum.db')
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{path}",
+        'SQLITE_JOURNAL_MODE': args.journal_mode,
+        'RATELIMIT_STORAGE_URI': 'memory://',
+        'FRAGMENT_CACHE_SIZE': '0',  # every read hits the database
+        'BCRYPT_LOG_ROUNDS': '4',
+        'PASSWORD_HASH_WORKERS': '0',
+    })
+    subprocess.run([sys.executable, os.path.join(ROOT, 'populate_db.py'), '--posts-per-category', str(args.posts_per_category)],
+                   cwd=tmpdir, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    connection = sqlite3.connect(path)
+    connection.execute(f"PRAGMA journal_mode={args.journal_mode}")
+    posts = connection.execute("SELECT post_type, id FROM post ORDER BY random() LIMIT 200").fetchall()
+    categories = connection.execute("SELECT post_type, category FROM category_stats").fetchall()
+    before = connection.execute("SELECT count(*) FROM post").fetchone()[0] + connection.execute("SELECT count(*) FROM comment").fetchone()[0]
+    urls = [f"/post/{post_type}/{post_id}" for post_type, post_id in posts]
+    urls += [f"/category/{post_type}/{category}?page={page}" for post_type, category in categories for page in (1, 2, 5)]
+    urls += [f"/search?query={term}" for term in ('access', 'data', 'rdp', 'sell')]
+
+    simulator = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'sellers_simulator.py'), '--rate', str(args.rate), '--duration', str(args.duration),
+         '--mix', 'sellers=2,buyers=1,comments=3', '--batch-size', '10', '--refresh', '5'],
+        cwd=tmpdir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+    )
+    deadline = time.time() + args.duration
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=reader, args=(deadline, urls, results)) for _ in range(args.readers)]
+    for proc in procs:
+        proc.start()
+    outcomes = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    log = simulator.communicate()[0]
+
+    after = connection.execute("SELECT count(*) FROM post").fetchone()[0] + connection.execute("SELECT count(*) FROM comment").fetchone()[0]
+    latencies = [latency for result, _, _ in outcomes for latency in result]
+    failures = sum(f for _, f, _ in outcomes)
+    errors = {}
+    for _, _, result in outcomes:
+        for message, count in result.items():
+            errors[message] = errors.get(message, 0) + count
+    print(f"journal_mode={args.journal_mode}, {args.readers} readers, simulator at {args.rate:.0f} rows/s for {args.duration:.0f}s")
+    print(f"reads: {len(latencies)} ({len(latencies) / args.duration:.1f}/s), failed: {failures}")
+    print(f"read latency ms: p50 {percentile(latencies, 50) * 1000:.1f}  p95 {percentile(latencies, 95) * 1000:.1f}  "
+          f"p99 {percentile(latencies, 99) * 1000:.1f}")
+    print(f"writes: {after - before} rows committed, failed batches: {log.count('Error committing')}")
+    for message, count in errors.items():
+        print(f"  {count} x {message}")
+
+
+if __name__ == '__main__':
+    multiprocessing.set_start_method('fork')
+    main()
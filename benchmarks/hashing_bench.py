@@ -0,0 +1,63 @@
+# benchmarks/hashing_bench.py
+"""Compare bcrypt login throughput: inline on one worker thread vs the process pool.
+
+Simulates concurrent logins, each checking one password. "sync" runs the checks
+one after another, as a single sync gunicorn worker would. "pooled" has
+--concurrency threads hand the checks to PasswordHasher's process pool.
+
+    python benchmarks/hashing_bench.py --logins 64 --concurrency 16 --rounds 12
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from password_hashing import PasswordHasher, HashingBusy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--logins', type=int, default=64)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=12)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    inline = PasswordHasher(rounds=args.rounds, workers=0)
+    pw_hash = inline.hash('pass123')
+
+    started = time.perf_counter()
+    for _ in range(args.logins):
+        assert inline.check(pw_hash, 'pass123')
+    sync_elapsed = time.perf_counter() - started
+
+    pooled = PasswordHasher(rounds=args.rounds, workers=args.workers, max_pending=args.concurrency, timeout=60)
+    pooled.check(pw_hash, 'pass123')  # start the pool before timing
+    busy = 0
+
+    def login(_):
+        nonlocal busy
+        try:
+            assert pooled.check(pw_hash, 'pass123')
+        except HashingBusy:
+            busy += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as threads:
+        list(threads.map(login, range(args.logins)))
+    pooled_elapsed = time.perf_counter() - started
+    pooled.shutdown()
+
+    print(f"{args.logins} logins, bcrypt rounds={args.rounds}, pool workers={args.workers}, concurrency={args.concurrency}")
+    print(f"{'mode':<8} {'seconds':>8} {'logins/s':>9} {'ms/login':>9}")
+    for mode, elapsed in (('sync', sync_elapsed), ('pooled', pooled_elapsed)):
+        print(f"{mode:<8} {elapsed:>8.2f} {args.logins / elapsed:>9.1f} {elapsed / args.logins * 1000:>9.1f}")
+    if busy:
+        print(f"{busy} logins rejected as busy")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,453 @@
+# benchmarks/load_test.py
+"""Load-test the forum routes with concurrent virtual users and save the results for comparison.
+
+Seeds a temporary SQLite database at the requested scale with populate_db.py
+(or uses --database as it is), then runs --users virtual users, one process
+each, for --duration seconds. Each user logs in as a seed user and loops over a
+weighted mix of scenarios:
+- home: the front page
+- category: first page of a category listing
+- category_deep: its last page, i.e. the deepest offset
+- post: post detail
+- profile: a user's profile page
+- search: a full-text search
+- login: log out, fetch the login form, then submit it with the CAPTCHA answer looked up in the database
+
+Requests go through the Flask test client by default. --server gunicorn starts
+a local gunicorn on the same database, configured by gunicorn.conf.py unless
+--workers, --threads or --worker-class override it. --url targets a server
+that is already running.
+
+For each scenario it reports throughput, p50/p95/p99 latency and SQL
+statements per request, and saves them as JSON under benchmarks/results/.
+--compare prints the change against an earlier results file. Statement counts
+come from the Server-Timing header added by INSTRUMENTATION=1 SERVER_TIMING=1.
+Test client and gunicorn runs set both; start a --url server with them too.
+
+    python benchmarks/load_test.py --posts-per-category 2000 --users 8 --duration 30
+    python benchmarks/load_test.py --server gunicorn --workers 2 --threads 4 --users 16
+    python benchmarks/load_test.py --compare benchmarks/results/load-20261017-120000.json
+"""
+import argparse
+import http.cookiejar
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import zlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_MIX = 'home=2,category=4,category_deep=1,post=4,profile=1,search=2,login=1'
+CATEGORY_PAGE_SIZE = 10  # per_page of the category view
+SEARCH_TERMS = ('access', 'data', 'rdp', 'sell', 'vpn', 'panel')
+SERVER_TIMING = re.compile(r'sql;dur=[\d.]+;desc="(\d+) statements"')
+
+
+class TestClientSession:
+    """One virtual user's cookies on the in-process app, through the Flask test client."""
+
+    def __init__(self):
+        from app import app
+        self.app = app
+        self.reset()
+
+    def reset(self):
+        self.client = self.app.test_client()
+
+    def request(self, method, url, data=None):
+        response = self.client.open(url, method=method, data=data)
+        response.close()
+        return response.status_code, response.headers.get('Server-Timing', '')
+
+    def captcha(self):
+        from models import db, CaptchaChallenge
+        with self.client.session_transaction() as session:
+            challenge_id = session.get('captcha_id')
+        with self.app.app_context():
+            challenge = db.session.get(CaptchaChallenge, challenge_id) if challenge_id else None
+            return challenge.code if challenge else None
+
+    def close(self):
+        # The bcrypt pool's processes are children of this one and would block its exit
+        from app import password_hasher
+        password_hasher.shutdown()
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None  # time the redirect itself, not the page it points to
+
+
+class HTTPSession:
+    """One virtual user's cookies on a running server, over HTTP."""
+
+    def __init__(self, base_url, database_url):
+        self.base_url = base_url.rstrip('/')
+        self.database_url = database_url
+        self.engine = None
+        self.reset()
+
+    def reset(self):
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), NoRedirect)
+
+    def request(self, method, url, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        try:
+            with self.opener.open(urllib.request.Request(self.base_url + url, data=body, method=method), timeout=60) as response:
+                response.read()
+                return response.status, response.headers.get('Server-Timing', '')
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code, e.headers.get('Server-Timing', '')
+
+    def captcha(self):
+        # The answer is kept server-side; the (readable) session cookie only names the challenge,
+        # so look its answer up in the database the way a human would read the image
+        from flask.json.tag import TaggedJSONSerializer
+        from itsdangerous.encoding import base64_decode
+        from sqlalchemy import create_engine, select
+        from models import CaptchaChallenge
+        for cookie in self.cookies:
+            if cookie.name == 'session':
+                payload = base64_decode(cookie.value.lstrip('.').split('.')[0])
+                if cookie.value.startswith('.'):
+                    payload = zlib.decompress(payload)
+                challenge_id = TaggedJSONSerializer().loads(payload.decode()).get('captcha_id')
+                if challenge_id is None:
+                    return None
+                if self.engine is None:
+                    self.engine = create_engine(self.database_url)
+                with self.engine.connect() as connection:
+                    return connection.execute(select(CaptchaChallenge.code).where(CaptchaChallenge.id == challenge_id)).scalar()
+        return None
+
+    def close(self):
+        if self.engine is not None:
+            self.engine.dispose()
+
+
+class VirtualUser:
+    """Runs scenarios for one seed user and records (latency, SQL statements, ok) per request."""
+
+    def __init__(self, session, credentials, targets):
+        self.session = session
+        self.username, self.password = credentials
+        self.targets = targets
+        self.recording = False
+        self.samples = {}
+        self.statuses = {}
+
+    def request(self, name, method, url, data=None, expect=None):
+        began = time.perf_counter()
+        try:
+            status, timing = self.session.request(method, url, data)
+        except Exception:
+            status, timing = 0, ''  # connection errors and timeouts
+        elapsed = time.perf_counter() - began
+        ok = status == expect if expect else 0 < status < 400
+        if self.recording:
+            match = SERVER_TIMING.search(timing)
+            self.samples.setdefault(name, []).append((elapsed, int(match.group(1)) if match else None, ok))
+            if not ok:
+                key = f"{name} {status}"
+                self.statuses[key] = self.statuses.get(key, 0) + 1
+        return status
+
+    def log_in(self):
+        self.session.reset()
+        self.request('login_form', 'GET', '/login')
+        data = {'username': self.username, 'password': self.password, 'captcha': self.session.captcha() or ''}
+        # A successful login redirects home; a 200 is the form again with an error
+        return self.request('login_submit', 'POST', '/login', data=data, expect=302) == 302
+
+
+def home(user):
+    user.request('home', 'GET', '/')
+
+
+def category(user):
+    post_type, name, _ = random.choice(user.targets['categories'])
+    user.request('category', 'GET', f"/category/{post_type}/{urllib.parse.quote(name)}")
+
+
+def category_deep(user):
+    post_type, name, pages = random.choice(user.targets['categories'])
+    user.request('category_deep', 'GET', f"/category/{post_type}/{urllib.parse.quote(name)}?page={pages}")
+
+
+def post(user):
+    post_type, post_id = random.choice(user.targets['posts'])
+    user.request('post', 'GET', f"/post/{post_type}/{post_id}")
+
+
+def profile(user):
+    user.request('profile', 'GET', f"/profile/{urllib.parse.quote(random.choice(user.targets['usernames']))}")
+
+
+def search(user):
+    user.request('search', 'GET', f"/search?{urllib.parse.urlencode({'query': random.choice(SEARCH_TERMS)})}")
+
+
+def login(user):
+    user.log_in()
+
+
+SCENARIOS = {'home': home, 'category': category, 'category_deep': category_deep, 'post': post,
+             'profile': profile, 'search': search, 'login': login}
+
+
+def parse_mix(text):
+    """Parse 'home=2,post=4' into {'home': 2.0, 'post': 4.0}."""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"Unknown scenario '{name}', expected one of {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def virtual_user(index, base_url, mix, targets, seed, start_at, deadline, results):
+    random.seed(seed + index)
+    session = HTTPSession(base_url, targets['database']) if base_url else TestClientSession()
+    user = VirtualUser(session, targets['credentials'][index % len(targets['credentials'])], targets)
+    if not user.log_in():
+        print(f"user {index}: initial login as {user.username} failed", file=sys.stderr)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    while time.time() < deadline:
+        # Requests during the warm-up are made but not recorded
+        user.recording = time.time() >= start_at
+        SCENARIOS[random.choices(names, weights=weights)[0]](user)
+    session.close()
+    results.put((user.samples, user.statuses))
+
+
+def load_targets(database_url):
+    """Categories (with their last page), a sample of posts, usernames and seed credentials from the database."""
+    from sqlalchemy import create_engine, func, select
+    from models import User, Post, Comment, CategoryStats
+    from seed_data import SEED_USERS
+    engine = create_engine(database_url)
+    try:
+        with engine.connect() as connection:
+            categories = [(post_type, name, max(1, math.ceil(count / CATEGORY_PAGE_SIZE)))
+                          for post_type, name, count in connection.execute(
+                              select(CategoryStats.post_type, CategoryStats.category, CategoryStats.count))]
+            posts = [tuple(row) for row in connection.execute(select(Post.post_type, Post.id).order_by(func.random()).limit(500))]
+            usernames = list(connection.execute(select(User.username)).scalars())
+            rows = {'users': len(usernames),
+                    'posts': connection.execute(select(func.count(Post.id))).scalar(),
+                    'comments': connection.execute(select(func.count(Comment.id))).scalar()}
+    finally:
+        engine.dispose()
+    credentials = [(username, password) for username, password, _ in SEED_USERS if username in usernames]
+    if not (categories and posts and credentials):
+        sys.exit(f"{database_url} has no seeded categories, posts or seed users; run without --database or with --seed")
+    return {'categories': categories, 'posts': posts, 'usernames': usernames, 'credentials': credentials,
+            'database': database_url}, rows
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(args, env, log_path):
+    port = free_port()
+    command = [sys.executable, '-m', 'gunicorn', '--config', os.path.join(ROOT, 'gunicorn.conf.py'), '--bind', f"127.0.0.1:{port}"]
+    for option, value in (('--workers', args.workers), ('--threads', args.threads), ('--worker-class', args.worker_class)):
+        if value is not None:
+            command += [option, str(value)]
+    command.append('app:app')
+    log = open(log_path, 'w')
+    server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(120):
+        try:
+            urllib.request.urlopen(base_url + '/', timeout=5).read()
+            return server, base_url
+        except OSError:
+            if server.poll() is not None:
+                break
+            time.sleep(0.5)
+    server.kill()
+    sys.exit(f"gunicorn did not start, see {log_path}")
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+def summarize(samples, seconds):
+    latencies = [latency for latency, _, _ in samples]
+    statements = [count for _, count, _ in samples if count is not None]
+    return {
+        'requests': len(samples),
+        'errors': sum(not ok for _, _, ok in samples),
+        'throughput': round(len(samples) / seconds, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(max(latencies, default=0.0) * 1000, 2),
+        'queries_per_request': round(sum(statements) / len(statements), 2) if statements else None,
+    }
+
+
+def print_table(scenarios):
+    print(f"{'scenario':<14} {'reqs':>7} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}")
+    for name, row in scenarios.items():
+        queries = f"{row['queries_per_request']:.1f}" if row['queries_per_request'] is not None else '-'
+        print(f"{name:<14} {row['requests']:>7} {row['errors']:>6} {row['throughput']:>8.1f} {row['p50_ms']:>8.1f} "
+              f"{row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {queries:>8}")
+
+
+def print_comparison(previous, scenarios):
+    print(f"\nchange against {previous['path']} ({previous['git'] or 'unknown commit'}, {previous['started']}):")
+    print(f"{'scenario':<14} {'req/s':>16} {'p50 ms':>16} {'p95 ms':>16} {'queries':>12}")
+
+    def change(old, new):
+        if old is None or new is None:
+            return '-'
+        percent = f" {(new - old) / old * 100:+.0f}%" if old else ''
+        return f"{old:.1f}->{new:.1f}{percent}"
+
+    for name, row in scenarios.items():
+        old = previous['scenarios'].get(name)
+        if old is None:
+            continue
+        print(f"{name:<14} {change(old['throughput'], row['throughput']):>16} {change(old['p50_ms'], row['p50_ms']):>16} "
+              f"{change(old['p95_ms'], row['p95_ms']):>16} {change(old['queries_per_request'], row['queries_per_request']):>12}")
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=4, help='concurrent virtual users (one process each)')
+    parser.add_argument('--duration', type=float, default=30, help='seconds of load, including the warm-up')
+    parser.add_argument('--warmup', type=float, default=5, help='seconds at the start that are not recorded')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"scenario weights (default {DEFAULT_MIX})")
+    parser.add_argument('--seed', type=int, default=1, help='random seed for the scenario choices')
+    parser.add_argument('--posts-per-category', type=int, default=1000, help='seeding scale')
+    parser.add_argument('--comments-per-post', type=int, default=2)
+    parser.add_argument('--bcrypt-rounds', type=int, default=12, help='work factor of the seeded passwords')
+    parser.add_argument('--database', help='use this database URL instead of seeding a temporary one')
+    parser.add_argument('--reseed', action='store_true', help='drop and reseed --database first')
+    parser.add_argument('--server', choices=('client', 'gunicorn'), default='client')
+    parser.add_argument('--workers', type=int, help='gunicorn workers (default from gunicorn.conf.py)')
+    parser.add_argument('--threads', type=int, help='gunicorn threads per worker (default from gunicorn.conf.py)')
+    parser.add_argument('--worker-class', help='gunicorn worker class: sync, gthread or gevent (default from gunicorn.conf.py)')
+    parser.add_argument('--url', help='load an already running server instead (needs --database for the targets)')
+    parser.add_argument('--no-cache', action='store_true', help='turn the page fragment cache off')
+    parser.add_argument('--output', help='results file (default benchmarks/results/load-<timestamp>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    args = parser.parse_args()
+    if args.url and not args.database:
+        parser.error('--url needs --database so the targets match the server')
+
+    tmpdir = tempfile.mkdtemp()
+    database_url = args.database or f"sqlite:///{os.path.join(tmpdir, 'forum.db')}"
+    env = dict(os.environ, DATABASE_URL=database_url, RATELIMIT_ENABLED='0', RATELIMIT_STORAGE_URI='memory://',
+               INSTRUMENTATION='1', SERVER_TIMING='1', BCRYPT_LOG_ROUNDS=str(args.bcrypt_rounds))
+    env.pop('DATABASE_REPLICA_URL', None)
+    if args.no_cache:
+        env['FRAGMENT_CACHE_SIZE'] = '0'
+    if not args.database or args.reseed:
+        print(f"seeding {database_url} with {args.posts_per_category} posts per category...")
+        subprocess.run([sys.executable, os.path.join(ROOT, 'populate_db.py'), '--posts-per-category', str(args.posts_per_category),
+                        '--comments-per-post', str(args.comments_per_post)],
+                       cwd=tmpdir, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    targets, rows = load_targets(database_url)
+
+    server = None
+    base_url = args.url
+    if base_url is None and args.server == 'gunicorn':
+        server, base_url = start_gunicorn(args, env, os.path.join(tmpdir, 'gunicorn.log'))
+    elif base_url is None:
+        # Virtual users import the app after forking, with the same settings gunicorn would get;
+        # the CAPTCHA font and static paths are relative to the repository
+        os.environ.update(env)
+        os.chdir(ROOT)
+
+    target = base_url or 'flask test client'
+    print(f"{args.users} users for {args.duration:.0f}s (warm-up {args.warmup:.0f}s) against {target}; "
+          f"{rows['posts']} posts, {rows['comments']} comments")
+    started = time.strftime('%Y-%m-%dT%H:%M:%S')
+    start_at = time.time() + args.warmup
+    deadline = time.time() + args.duration
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=virtual_user, args=(i, base_url, args.mix, targets, args.seed, start_at, deadline, results))
+             for i in range(args.users)]
+    try:
+        for proc in procs:
+            proc.start()
+        outcomes = [results.get() for _ in procs]
+        for proc in procs:
+            proc.join()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    measured = max(args.duration - args.warmup, 1e-9)
+    merged, statuses = {}, {}
+    for samples, failed in outcomes:
+        for name, values in samples.items():
+            merged.setdefault(name, []).extend(values)
+        for key, count in failed.items():
+            statuses[key] = statuses.get(key, 0) + count
+    scenarios = {name: summarize(merged[name], measured) for name in sorted(merged)}
+    scenarios['total'] = summarize([sample for values in merged.values() for sample in values], measured)
+    print_table(scenarios)
+    for key, count in sorted(statuses.items()):
+        print(f"  {count} x failed {key}")
+
+    report = {
+        'started': started,
+        'git': git_revision(),
+        'target': args.url or args.server,
+        'settings': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'rows': rows,
+        'failures': statuses,
+        'scenarios': scenarios,
+    }
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results', f"load-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"results saved to {output}")
+    if args.compare:
+        with open(args.compare) as f:
+            previous = dict(json.load(f), path=args.compare)
+        print_comparison(previous, scenarios)
+
+
+if __name__ == '__main__':
+    multiprocessing.set_start_method('fork')
+    main()
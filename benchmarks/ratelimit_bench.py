@@ -0,0 +1,78 @@
+# benchmarks/ratelimit_bench.py
+"""Multi-process check of rate limit enforcement and per-check overhead.
+
+Spawns several processes that all hammer the same rate limit key, the way
+gunicorn workers share one client IP, then reports how many hits were allowed
+in total (should equal the limit for shared storage) and the mean cost of a
+single check.
+
+    python benchmarks/ratelimit_bench.py --processes 4 --hits 500 --limit "200/hour"
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import STRATEGIES
+import ratelimit_storage  # registers sqlite://
+
+
+def worker(uri, strategy, limit, hits, key, start, results):
+    limiter = STRATEGIES[strategy](storage_from_string(uri))
+    item = parse(limit)
+    start.wait()
+    allowed = 0
+    began = time.perf_counter()
+    for _ in range(hits):
+        if limiter.hit(item, key):
+            allowed += 1
+    results.put((allowed, time.perf_counter() - began))
+
+
+def run(uri, strategy, limit, processes, hits):
+    start = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    key = f"bench-{os.getpid()}-{time.time()}"
+    procs = [multiprocessing.Process(target=worker, args=(uri, strategy, limit, hits, key, start, results))
+             for _ in range(processes)]
+    for proc in procs:
+        proc.start()
+    start.set()
+    outcomes = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    allowed = sum(a for a, _ in outcomes)
+    per_check_us = sum(t for _, t in outcomes) / (processes * hits) * 1e6
+    return allowed, per_check_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--hits', type=int, default=500, help='checks per process')
+    parser.add_argument('--limit', default='200/hour')
+    parser.add_argument('--strategies', default='fixed-window,moving-window,sliding-window-counter')
+    parser.add_argument('--uri', action='append', help='storage URIs to compare (default: memory:// and a temp sqlite file)')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    uris = args.uri or ['memory://', f"sqlite:///{os.path.join(tmpdir, 'ratelimits.db')}"]
+    expected = parse(args.limit).amount
+    print(f"{args.processes} processes x {args.hits} checks against '{args.limit}' (expected allowed: {expected})")
+    print(f"{'storage':<40} {'strategy':<24} {'allowed':>8} {'us/check':>10}")
+    for uri in uris:
+        for strategy in args.strategies.split(','):
+            allowed, per_check_us = run(uri, strategy, args.limit, args.processes, args.hits)
+            label = uri if len(uri) <= 40 else '...' + uri[-37:]
+            print(f"{label:<40} {strategy:<24} {allowed:>8} {per_check_us:>10.1f}")
+
+
+if __name__ == '__main__':
+    multiprocessing.set_start_method('fork')
+    main()
@@ -0,0 +1,98 @@
+# benchmarks/worker_bench.py
+"""Compare gunicorn worker models on the forum's own routes.
+
+Seeds one temporary database, then runs benchmarks/load_test.py against a
+local gunicorn once per worker model with the same users, mix and duration.
+The models are:
+- sync-1: a single sync worker, the old entrypoint
+- sync: sync workers at the gunicorn.conf.py worker count
+- gthread: the gunicorn.conf.py defaults
+- gevent: gevent workers, when gevent is installed
+
+The default mix includes logins at the production bcrypt work factor. This
+shows how a slow password check holds up the page views queued behind it.
+Prints throughput and latency per model, and saves each run's results plus a
+summary under benchmarks/results/.
+
+    python benchmarks/worker_bench.py --users 16 --duration 30
+    python benchmarks/worker_bench.py --models sync-1,gthread --users 32
+"""
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOAD_TEST = os.path.join(ROOT, 'benchmarks', 'load_test.py')
+
+# load_test.py gunicorn options per model; anything left out comes from gunicorn.conf.py
+MODELS = {
+    'sync-1': ['--worker-class', 'sync', '--workers', '1', '--threads', '1'],
+    'sync': ['--worker-class', 'sync', '--threads', '1'],
+    'gthread': ['--worker-class', 'gthread'],
+    'gevent': ['--worker-class', 'gevent', '--threads', '1'],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--models', default=','.join(MODELS), help=f"comma-separated, from {', '.join(MODELS)}")
+    parser.add_argument('--users', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--warmup', type=float, default=5)
+    parser.add_argument('--mix', help='scenario weights passed to load_test.py')
+    parser.add_argument('--posts-per-category', type=int, default=1000)
+    parser.add_argument('--bcrypt-rounds', type=int, default=12)
+    args = parser.parse_args()
+
+    models = [name.strip() for name in args.models.split(',')]
+    unknown = [name for name in models if name not in MODELS]
+    if unknown:
+        parser.error(f"unknown model(s): {', '.join(unknown)}")
+    if 'gevent' in models and importlib.util.find_spec('gevent') is None:
+        print("gevent: skipped (pip install gevent)")
+        models.remove('gevent')
+
+    tmpdir = tempfile.mkdtemp()
+    database_url = f"sqlite:///{os.path.join(tmpdir, 'forum.db')}"
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    results_dir = os.path.join(ROOT, 'benchmarks', 'results')
+    common = ['--users', str(args.users), '--duration', str(args.duration), '--warmup', str(args.warmup),
+              '--database', database_url, '--server', 'gunicorn']
+    if args.mix:
+        common += ['--mix', args.mix]
+    # The first run seeds the database; the others reuse it so every model sees the same data
+    seed = ['--reseed', '--posts-per-category', str(args.posts_per_category), '--bcrypt-rounds', str(args.bcrypt_rounds)]
+
+    summary = {}
+    for index, name in enumerate(models):
+        output = os.path.join(results_dir, f"workers-{stamp}-{name}.json")
+        print(f"\n== {name} ==")
+        command = [sys.executable, LOAD_TEST] + common + MODELS[name] + ['--output', output] + (seed if index == 0 else [])
+        if subprocess.run(command, cwd=tmpdir).returncode != 0:
+            print(f"{name}: load test failed")
+            continue
+        with open(output) as f:
+            scenarios = json.load(f)['scenarios']
+        summary[name] = {'results': output, 'scenarios': scenarios}
+
+    print(f"\n{args.users} users, {args.duration - args.warmup:.0f}s measured per model")
+    print(f"{'model':<8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>9} {'errors':>7} {'home p95':>9} {'login p95':>10}")
+    for name, result in summary.items():
+        total = result['scenarios']['total']
+        home = result['scenarios'].get('home', {}).get('p95_ms', 0.0)
+        login = result['scenarios'].get('login_submit', {}).get('p95_ms', 0.0)
+        print(f"{name:<8} {total['throughput']:>8.1f} {total['p50_ms']:>8.1f} {total['p95_ms']:>8.1f} {total['p99_ms']:>9.1f} "
+              f"{total['errors']:>7} {home:>9.1f} {login:>10.1f}")
+    output = os.path.join(results_dir, f"workers-{stamp}.json")
+    with open(output, 'w') as f:
+        json.dump({'started': stamp, 'settings': vars(args), 'cpus': os.cpu_count(), 'models': summary}, f, indent=2)
+    print(f"summary saved to {output}")
+
+
+if __name__ == '__main__':
+    main()
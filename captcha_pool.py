@@ -0,0 +1,153 @@
+# captcha_pool.py
+from collections import OrderedDict, deque
+import glob
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CaptchaPool:
+    """Bounded pool of pre-rendered CAPTCHA challenges, refilled by a background thread.
+
+    Challenges are kept in memory only. `take()` hands out a fresh code and
+    remembers its PNG so `image_for()` can serve it; a code whose image lives in
+    another worker process is rendered on demand (counted as a miss).
+    """
+
+    def __init__(self, image_captcha, chars, length, size=50, ttl=300, issued_size=1000, janitor_dir=None):
+        self.image_captcha = image_captcha
+        self.chars = chars
+        self.length = length
+        self.size = size
+        self.ttl = ttl
+        self.issued_size = issued_size
+        self.janitor_dir = janitor_dir
+        self._ready = deque()
+        self._issued = OrderedDict()
+        self._lock = threading.Lock()
+        self._wanted = threading.Event()
+        self._pid = None
+        self.hits = 0
+        self.misses = 0
+        self.renders = 0
+        self.render_seconds = 0.0
+
+    def _render(self, code):
+        start = time.perf_counter()
+        png = self.image_captcha.generate(code).getvalue()
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.renders += 1
+            self.render_seconds += elapsed
+        return png
+
+    def _new_challenge(self):
+        code = ''.join(random.choice(self.chars) for _ in range(self.length))
+        return code, self._render(code), time.time()
+
+    def _ensure_worker(self):
+        # Threads do not survive fork, so each worker process starts its own refiller
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        threading.Thread(target=self._refill_loop, name='captcha-refill', daemon=True).start()
+
+    def _refill_loop(self):
+        self.clean_orphaned_files()
+        last_clean = time.time()
+        while True:
+            self._expire()
+            while len(self._ready) < self.size:
+                challenge = self._new_challenge()
+                with self._lock:
+                    self._ready.append(challenge)
+            if time.time() - last_clean > self.ttl:
+                self.clean_orphaned_files()
+                last_clean = time.time()
+            self._wanted.wait(timeout=self.ttl / 2)
+            self._wanted.clear()
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            while self._ready and self._ready[0][2] < cutoff:
+                self._ready.popleft()
+            while self._issued and next(iter(self._issued.values()))[1] < cutoff:
+                self._issued.popitem(last=False)
+
+    def warm(self):
+        """Start filling this process's pool ahead of the first `take()`."""
+        self._ensure_worker()
+
+    def take(self):
+        """Return a fresh challenge code and remember its image for `image_for()`."""
+        self._ensure_worker()
+        cutoff = time.time() - self.ttl
+        challenge = None
+        with self._lock:
+            while self._ready:
+                candidate = self._ready.popleft()
+                if candidate[2] >= cutoff:
+                    challenge = candidate
+                    break
+            if challenge:
+                self.hits += 1
+            else:
+                self.misses += 1
+        self._wanted.set()
+        if challenge is None:
+            challenge = self._new_challenge()
+        code, png, created = challenge
+        with self._lock:
+            self._issued[code] = (png, created)
+            while len(self._issued) > self.issued_size:
+                self._issued.popitem(last=False)
+        return code
+
+    def image_for(self, code):
+        """PNG bytes for an issued code, rendering it if this process has not got it."""
+        with self._lock:
+            entry = self._issued.get(code)
+        if entry:
+            return entry[0]
+        with self._lock:
+            self.misses += 1
+        png = self._render(code)
+        with self._lock:
+            self._issued[code] = (png, time.time())
+        return png
+
+    def discard(self, code):
+        with self._lock:
+            self._issued.pop(code, None)
+
+    def clean_orphaned_files(self):
+        """Delete CAPTCHA images left on disk by the old file-based implementation."""
+        if not self.janitor_dir:
+            return 0
+        removed = 0
+        for path in glob.glob(os.path.join(self.janitor_dir, 'captcha_*.png')):
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError as e:
+                logger.warning(f"Error deleting orphaned CAPTCHA image {path}: {e}")
+        if removed:
+            logger.info(f"Removed {removed} orphaned CAPTCHA images")
+        return removed
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pool_size': len(self._ready),
+                'issued': len(self._issued),
+                'hits': self.hits,
+                'misses': self.misses,
+                'renders': self.renders,
+                'render_seconds_total': round(self.render_seconds, 6),
+                'render_seconds_avg': round(self.render_seconds / self.renders, 6) if self.renders else 0.0
+            }
@@ -0,0 +1,96 @@
+# db_config.py
+from sqlalchemy import event
+from models import db
+import functools
+import os
+
+# Relative SQLite paths resolve against the app's instance folder. Any other
+# SQLAlchemy URL works too, e.g. postgresql+psycopg://forum:secret@db/forum
+DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///database.db')
+# Optional read replica for read-heavy views (see use_replica)
+DATABASE_REPLICA_URI = os.environ.get('DATABASE_REPLICA_URL')
+
+# Applied to every new SQLite connection. WAL lets the simulator write while
+# web workers keep reading; busy_timeout makes a second writer wait for the
+# lock instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),  # milliseconds
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),  # NORMAL is durable enough under WAL
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -64000)),  # negative means KiB
+}
+
+# One pooled connection per request thread, plus headroom for CLI/background work
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', -1))  # seconds; set below a server's idle timeout
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '0') == '1'
+DB_ECHO = os.environ.get('DB_ECHO', '0') == '1'
+
+
+def is_sqlite(uri):
+    return uri.startswith('sqlite')
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def engine_options(uri):
+    """Engine keyword arguments for a database URI."""
+    options = {'echo': DB_ECHO}
+    if is_sqlite(uri) and (':memory:' in uri or uri in ('sqlite://', 'sqlite:///')):
+        # In-memory databases live in a single connection; leave SQLAlchemy's default pool
+        return options
+    options.update({
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING,
+    })
+    if is_sqlite(uri):
+        # pysqlite's own lock timeout, in seconds, matching busy_timeout
+        options['connect_args'] = {'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000}
+    return options
+
+
+def configure_database(app, uri=None, replica_uri=None):
+    """Point an app at the shared database, initialise Flask-SQLAlchemy and install the pragmas.
+
+    app.py, populate_db.py and sellers_simulator.py all go through here so
+    every process talking to the database uses the same settings. With a
+    replica URI, the replica is registered as the 'replica' bind.
+    """
+    uri = uri or DATABASE_URI
+    replica_uri = replica_uri or DATABASE_REPLICA_URI
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(uri)
+    if replica_uri:
+        app.config['SQLALCHEMY_BINDS'] = {'replica': dict(engine_options(replica_uri), url=replica_uri)}
+    db.init_app(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', apply_sqlite_pragmas)
+
+
+def use_replica(view):
+    """Let a read-heavy view run its queries on the read replica, when one is configured.
+
+    Replicas lag the primary, so only use this on pages where a few seconds of
+    staleness is fine.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        db.session.info['use_replica'] = True
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,79 @@
+# fragment_cache.py
+from collections import OrderedDict
+import threading
+import time
+
+
+class FragmentCache:
+    """Bounded LRU of rendered HTML fragments with a TTL and version checks.
+
+    Each entry remembers the version it was rendered at (for this app, the
+    write stamps of the category, or of the post and its author). A
+    lookup with a different version is a miss and drops the stale entry, so
+    writes from any process invalidate exactly the pages they affect.
+    """
+
+    def __init__(self, maxsize=1000, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.not_modified = 0
+
+    def get(self, key, version=None):
+        """Return (value, meta, version) for a fresh entry, or None.
+
+        `version` may be a callable taking the entry's meta, for entries whose
+        current version can only be looked up once we know what they hold. A
+        callable that returns None means the source is gone: the entry is evicted.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+        gone = False
+        if entry is not None and callable(version):
+            version = version(entry[1])
+            gone = version is None
+        with self._lock:
+            if entry is None or self._entries.get(key) is not entry:
+                self.misses += 1
+                return None
+            value, meta, entry_version, expires = entry
+            if expires < now or gone or (version is not None and entry_version != version):
+                del self._entries[key]
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value, meta, entry_version
+
+    def set(self, key, value, version=None, meta=None):
+        with self._lock:
+            self._entries[key] = (value, meta, version, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'not_modified': self.not_modified,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
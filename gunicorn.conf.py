@@ -0,0 +1,70 @@
+# gunicorn.conf.py
+"""Gunicorn settings for serving the forum.
+
+gunicorn loads this file from the working directory (or with -c). Each
+setting can be overridden with the GUNICORN_* variable next to it, or on the
+gunicorn command line.
+"""
+import multiprocessing
+import os
+import sys
+
+_cpus = multiprocessing.cpu_count()
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+
+# gthread (default) serves several requests per worker on threads, so a slow bcrypt
+# check or CAPTCHA render only ties up one thread. gevent suits many idle connections
+# (slow Tor clients, change feed long-polls and streams) but needs `pip install gevent`.
+# sync is one request per worker at a time.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('GUNICORN_WORKERS', _cpus * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4 if worker_class == 'gthread' else 1))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 200))  # gevent: concurrent requests per worker
+
+# Import the app once in the master so workers fork with it loaded (faster starts,
+# shared memory); post_fork below gives each worker its own connections and caches
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+# Recycle workers now and then to bound slow memory growth; the jitter keeps
+# them from all restarting at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')  # '-' for stdout
+
+# Every worker has its own bcrypt process pool; split the CPUs between them
+# rather than starting a pool the size of the machine in each one
+os.environ.setdefault('PASSWORD_HASH_WORKERS', str(max(1, _cpus // workers)))
+
+if worker_class == 'gevent':
+    # Patch before the app is preloaded, so the locks and sockets it creates are cooperative
+    from gevent import monkey
+    monkey.patch_all()
+
+
+def post_fork(server, worker):
+    """Drop state a worker inherited from the preloaded master."""
+    app_module = sys.modules.get('app')
+    if app_module is None:
+        return  # not preloaded: the worker imports the app itself
+    from models import db
+    with app_module.app.app_context():
+        for engine in db.engines.values():
+            # Forget the master's pooled connections without closing them from under it
+            engine.dispose(close=False)
+    # Per-process caches start empty, and the CAPTCHA pool starts refilling right away;
+    # the bcrypt pool and rate limit connections rebuild themselves when the pid changes
+    app_module.fragment_cache.clear()
+    app_module.user_cache.clear()
+    app_module.captcha_pool.warm()
+
+
+def worker_exit(server, worker):
+    """Stop the worker's bcrypt pool so recycled workers don't leave processes behind."""
+    app_module = sys.modules.get('app')
+    if app_module is not None:
+        app_module.password_hasher.shutdown()
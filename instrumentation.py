@@ -0,0 +1,198 @@
+# instrumentation.py
+from contextlib import contextmanager
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram keyed by a tuple of label values."""
+
+    def __init__(self, name, help_text, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, label_values, value):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][i] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total, count) in sorted(self._series.items()):
+            labels = _format_labels(self.labels, label_values)
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {bucket_count}')
+            lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total:.6f}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+
+def _format_labels(names, values):
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in values)
+    return ','.join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+
+class Instrumentation:
+    """Opt-in request profiling: route latency, SQL statements, template renders and timed operations.
+
+    Metrics are kept per process and rendered in the Prometheus text format by
+    `render()`. Requests slower than `slow_request_ms` are logged with their SQL
+    and template breakdown and their slowest statements. With `server_timing`,
+    each response also carries its SQL and template time in a Server-Timing
+    header, which is how benchmarks/load_test.py counts queries per request.
+    When disabled, nothing is hooked and `timer()` costs one attribute check.
+    """
+
+    def __init__(self, enabled=False, slow_request_ms=None, server_timing=False):
+        self.enabled = enabled
+        self.slow_request_ms = slow_request_ms
+        self.server_timing = server_timing
+        self._lock = threading.Lock()
+        self._gauges = {}
+        self.requests = Histogram('forum_request_duration_seconds', 'Request latency by route.', ('endpoint', 'method', 'status'))
+        self.request_statements = Histogram('forum_request_sql_statements', 'SQL statements executed per request.', ('endpoint',), COUNT_BUCKETS)
+        self.request_sql = Histogram('forum_request_sql_seconds', 'Time spent in SQL per request.', ('endpoint',))
+        self.templates = Histogram('forum_template_render_seconds', 'Jinja render time by template.', ('template',))
+        self.operations = Histogram('forum_operation_seconds', 'Timed operations such as CAPTCHA issue and bcrypt.', ('operation',))
+
+    def init_app(self, app, db):
+        if not self.enabled:
+            return
+        # Run first so rate limiting and login checks are part of the measured time
+        app.before_request_funcs.setdefault(None, []).insert(0, self._start_request)
+        app.after_request(self._record_status)
+        app.teardown_request(self._finish_request)
+        before_render_template.connect(self._start_template, app)
+        template_rendered.connect(self._finish_template, app)
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, 'before_cursor_execute', self._start_statement)
+                event.listen(engine, 'after_cursor_execute', self._finish_statement)
+                event.listen(engine, 'handle_error', self._abandon_statement)
+
+    def register_gauges(self, prefix, stats):
+        """Expose the numeric values of a stats() callable as gauges named forum_<prefix>_<key>."""
+        self._gauges[prefix] = stats
+
+    @contextmanager
+    def timer(self, operation):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.operations.observe((operation,), elapsed)
+
+    def _start_request(self):
+        g._instrumentation = {'start': time.perf_counter(), 'statements': 0, 'sql_seconds': 0.0,
+                              'template_seconds': 0.0, 'templates': [], 'slowest': [], 'status': 500}
+
+    def _record_status(self, response):
+        state = g.get('_instrumentation')
+        if state is not None:
+            state['status'] = response.status_code
+            if self.server_timing:
+                # Streamed responses only report what ran before the first chunk
+                response.headers['Server-Timing'] = (
+                    f'sql;dur={state["sql_seconds"] * 1000:.2f};desc="{state["statements"]} statements", '
+                    f'template;dur={state["template_seconds"] * 1000:.2f}'
+                )
+        return response
+
+    def _finish_request(self, exc=None):
+        state = g.pop('_instrumentation', None)
+        if state is None:
+            return
+        elapsed = time.perf_counter() - state['start']
+        endpoint = request.endpoint or 'unmatched'
+        with self._lock:
+            self.requests.observe((endpoint, request.method, state['status']), elapsed)
+            self.request_statements.observe((endpoint,), state['statements'])
+            self.request_sql.observe((endpoint,), state['sql_seconds'])
+        if self.slow_request_ms is not None and elapsed * 1000 >= self.slow_request_ms:
+            slowest = '; '.join(f"{seconds * 1000:.1f}ms {statement}" for seconds, statement in sorted(state['slowest'], reverse=True))
+            logger.warning(
+                f"Slow request {request.method} {request.full_path.rstrip('?')} -> {state['status']} in {elapsed * 1000:.1f}ms: "
+                f"{state['statements']} SQL statements in {state['sql_seconds'] * 1000:.1f}ms, "
+                f"templates {state['template_seconds'] * 1000:.1f}ms; slowest SQL: {slowest or 'none'}"
+            )
+
+    def _start_statement(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_instrumentation_start', []).append(time.perf_counter())
+
+    def _finish_statement(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('_instrumentation_start')
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        if not has_request_context():
+            return
+        state = g.get('_instrumentation')
+        if state is None:
+            return
+        state['statements'] += 1
+        state['sql_seconds'] += elapsed
+        if self.slow_request_ms is not None:
+            # Keep the five slowest statements for the slow-request log
+            state['slowest'].append((elapsed, ' '.join(statement.split())[:200]))
+            state['slowest'] = sorted(state['slowest'], reverse=True)[:5]
+
+    def _abandon_statement(self, exception_context):
+        # A statement that raised never reaches after_cursor_execute; drop its start time
+        conn = exception_context.connection
+        starts = conn.info.get('_instrumentation_start') if conn is not None else None
+        if starts and exception_context.execution_context is not None:
+            starts.pop()
+
+    def _start_template(self, sender, template, context, **extra):
+        state = g.get('_instrumentation')
+        if state is not None:
+            state['templates'].append(time.perf_counter())
+
+    def _finish_template(self, sender, template, context, **extra):
+        state = g.get('_instrumentation')
+        if state is None or not state['templates']:
+            return
+        elapsed = time.perf_counter() - state['templates'].pop()
+        if not state['templates']:
+            # Only top-level renders count towards the request total; nested ones are inside it
+            state['template_seconds'] += elapsed
+        with self._lock:
+            self.templates.observe((template.name or 'string',), elapsed)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            lines = []
+            for histogram in (self.requests, self.request_statements, self.request_sql, self.templates, self.operations):
+                lines.extend(histogram.render())
+        for prefix, stats in self._gauges.items():
+            for key, value in stats().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    name = f"forum_{prefix}_{key}"
+                    lines.extend([f"# TYPE {name} gauge", f"{name} {value}"])
+        # Metrics are per process; the pid tells apart scrapes that landed on different workers
+        lines.extend(["# TYPE forum_process_id gauge", f"forum_process_id {os.getpid()}"])
+        return '\n'.join(lines) + '\n'
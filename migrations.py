@@ -0,0 +1,204 @@
+# migrations.py
+from sqlalchemy import String, inspect
+from sqlalchemy.orm import Session
+from models import db, Post, Comment, CategoryStats, UserStats, rebuild_category_stats, rebuild_user_stats
+from search_index import rebuild_search_index
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def add_missing_columns():
+    """Add columns declared on the models that existing tables lack.
+
+    New columns must be nullable or carry a server_default so SQLite can
+    add them with ALTER TABLE.
+    """
+    inspector = inspect(db.engine)
+    added = []
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"{column.name} {column.type.compile(dialect=connection.dialect)}"
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg!r}" if isinstance(column.server_default.arg, str) else ''
+                if not column.nullable:
+                    ddl += " NOT NULL"
+                connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+                added.append(f"{table.name}.{column.name}")
+                logger.info(f"Added column {column.name} to {table.name}")
+    return added
+
+
+def create_missing_indexes():
+    """Create indexes declared on the models that an existing database lacks."""
+    inspector = inspect(db.engine)
+    created = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=db.engine)
+                created.append(index.name)
+                logger.info(f"Created index {index.name} on {table.name}")
+    return created
+
+
+# Columns that were String(20) 'YYYY-MM-DD HH:MM:SS' text before they became DateTime
+DATE_COLUMNS = [('post', 'date'), ('comment', 'date')]
+
+
+def date_from_string(connection, column):
+    """SQL reading a string date column as the value a DateTime column holds on this backend."""
+    if connection.dialect.name == 'sqlite':
+        return f"replace(substr({column}, 1, 19), 'T', ' ')"
+    return f"nullif({column}, '')::timestamp(0)"
+
+
+def is_string_column(inspector, table, column):
+    return isinstance(next(c['type'] for c in inspector.get_columns(table) if c['name'] == column), String)
+
+
+def convert_date_columns():
+    """Convert date columns still declared as strings to timestamps.
+
+    PostgreSQL gets ALTER COLUMN ... TYPE timestamp. SQLite cannot change a
+    column's declared type and stores DateTime as text anyway, so there the
+    rows are normalised to the format models.Timestamp writes (seconds, space
+    separator), which keeps range comparisons and index order correct.
+    """
+    inspector = inspect(db.engine)
+    converted = []
+    with db.engine.begin() as connection:
+        for table, column in DATE_COLUMNS:
+            if not inspector.has_table(table) or not is_string_column(inspector, table, column):
+                continue
+            if connection.dialect.name == 'sqlite':
+                connection.exec_driver_sql(
+                    f"UPDATE {table} SET {column} = {date_from_string(connection, column)} "
+                    f"WHERE {column} IS NOT NULL AND (length({column}) != 19 OR {column} LIKE '%T%')"
+                )
+            else:
+                connection.exec_driver_sql(
+                    f"ALTER TABLE {table} ALTER COLUMN {column} TYPE timestamp(0) USING {date_from_string(connection, column)}"
+                )
+                logger.info(f"Converted {table}.{column} to timestamp")
+            converted.append(f"{table}.{column}")
+    return converted
+
+
+# Pre-unification table -> (post_type, body column, has price, Comment.post_type value)
+LEGACY_POST_TABLES = [
+    ('marketplace', 'marketplace', 'description', True, 'marketplace'),
+    ('announcement', 'announcements', 'content', False, 'announcement'),
+    ('service', 'services', 'description', True, 'service'),
+]
+
+
+def unify_post_tables():
+    """Move the per-type announcement/marketplace/service tables into `post`.
+
+    Marketplace rows keep their ids. The other types are renumbered above every
+    old id, so an old URL never collides with a new post of the same type;
+    each row records its old id in legacy_id for the redirect in post_detail.
+    Comments are rebuilt against post.id and lose their post_type column, and
+    string dates are converted on the way.
+    The other current tables are created and the counters filled in the same
+    transaction, so a failure leaves the legacy tables as they were.
+    Returns False if there was nothing to migrate.
+    """
+    inspector = inspect(db.engine)
+    if not inspector.has_table('announcement') or inspector.has_table('post'):
+        return False
+    string_dates = {table: is_string_column(inspector, table, 'date') for table in [t for t, *_ in LEGACY_POST_TABLES] + ['comment']}
+    with db.engine.begin() as connection:
+        if connection.dialect.name == 'sqlite' and not connection.connection.driver_connection.in_transaction:
+            # pysqlite only opens a transaction before DML; open it now so the DDL below rolls back too
+            connection.exec_driver_sql("BEGIN")
+        if connection.dialect.name == 'sqlite':
+            # The old search index keys on per-table rowids; it is rebuilt afterwards
+            for table, *_ in LEGACY_POST_TABLES:
+                for action in ('insert', 'delete', 'update'):
+                    connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {table}_search_{action}")
+            connection.exec_driver_sql("DROP TABLE IF EXISTS post_search")
+        for index in inspector.get_indexes('comment'):
+            connection.exec_driver_sql(f"DROP INDEX IF EXISTS {index['name']}")
+        connection.exec_driver_sql("ALTER TABLE comment RENAME TO comment_legacy")
+        Post.__table__.create(connection)
+        Comment.__table__.create(connection)
+        next_id = max(
+            connection.exec_driver_sql(f"SELECT coalesce(max(id), 0) FROM {table}").scalar()
+            for table, *_ in LEGACY_POST_TABLES
+        ) + 1
+        for table, post_type, body, has_price, _ in LEGACY_POST_TABLES:
+            price = 'price' if has_price else 'NULL'
+            date = date_from_string(connection, 'date') if string_dates[table] else 'date'
+            new_id = 'id' if post_type == 'marketplace' else f"{next_id} + row_number() OVER (ORDER BY id) - 1"
+            moved = connection.exec_driver_sql(
+                f"INSERT INTO post (id, post_type, category, title, body, user_id, price, date, legacy_id) "
+                f"SELECT {new_id}, '{post_type}', category, title, {body}, user_id, {price}, {date}, id FROM {table}"
+            ).rowcount
+            if post_type != 'marketplace':
+                next_id += moved
+            logger.info(f"Moved {moved} rows from {table} into post")
+        date = date_from_string(connection, 'c.date') if string_dates['comment'] else 'c.date'
+        cases = ' '.join(f"WHEN '{comment_type}' THEN '{post_type}'" for _, post_type, _, _, comment_type in LEGACY_POST_TABLES)
+        moved = connection.exec_driver_sql(
+            "INSERT INTO comment (id, post_id, user_id, content, date) "
+            f"SELECT c.id, p.id, c.user_id, c.content, {date} FROM comment_legacy c "
+            f"JOIN post p ON p.legacy_id = c.post_id AND p.post_type = CASE c.post_type {cases} END"
+        ).rowcount
+        logger.info(f"Moved {moved} comments onto post ids")
+        if connection.dialect.name == 'postgresql':
+            # Rows were inserted with explicit ids, so move the sequences past them
+            for table in ('post', 'comment'):
+                connection.exec_driver_sql(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), coalesce(max(id), 0) + 1, false) FROM {table}"
+                )
+        for table in ['comment_legacy'] + [table for table, *_ in LEGACY_POST_TABLES]:
+            connection.exec_driver_sql(f"DROP TABLE {table}")
+        db.metadata.create_all(connection)
+        with Session(bind=connection) as session:
+            rebuild_category_stats(session)
+            rebuild_user_stats(session)
+    return True
+
+
+def counters_need_backfill(model):
+    """True if a counter table is empty although there are posts: newly created, or left empty by an interrupted upgrade."""
+    return db.session.query(model).first() is None and db.session.query(Post.id).first() is not None
+
+
+def upgrade_db():
+    """Bring an existing database up to the current schema without dropping data.
+
+    Must be called inside an app context. Missing tables are created (with their
+    indexes), missing columns are added, then indexes added to the models since the database was built are
+    created on the existing tables. A database from before the post tables were
+    unified is migrated first, and string date columns are converted. A search
+    index created for the first time, and counter tables that are empty while
+    there are posts, are backfilled from the existing posts.
+    """
+    had_search_index = inspect(db.engine).has_table('post_search')
+    if unify_post_tables():
+        had_search_index = False  # the old index pointed at the per-type tables
+    db.create_all()
+    add_missing_columns()
+    convert_date_columns()
+    created = create_missing_indexes()
+    if not had_search_index:
+        logger.info(f"Backfilled search index with {rebuild_search_index()} posts")
+    if counters_need_backfill(CategoryStats):
+        rebuild_category_stats()
+        logger.info("Backfilled category counters")
+    if counters_need_backfill(UserStats):
+        rebuild_user_stats()
+        logger.info("Backfilled per-user counters")
+    return created
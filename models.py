@@ -1,49 +1,346 @@
 # models.py
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as FlaskSession
 from flask_login import UserMixin
+from sqlalchemy import case, event, func, inspect, literal, select
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import Session
+from collections import Counter, defaultdict
+import time
 
-db = SQLAlchemy()
+class RoutingSession(FlaskSession):
+    """Session that sends reads to the 'replica' bind once a view opts in with db_config.use_replica.
+
+    Writes, and any query issued while flushing, stay on the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get('use_replica') and not self._flushing and clause is not None and not clause.is_dml:
+            replica = self._db.engines.get('replica')
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# Post and comment timestamps, to the second. SQLite keeps them as
+# 'YYYY-MM-DD HH:MM:SS' text, the format the old String(20) columns used, so
+# converted rows and new rows compare and sort correctly together.
+Timestamp = db.DateTime().with_variant(
+    sqlite.DATETIME(storage_format='%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d'), 'sqlite'
+)
 
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(50), unique=True, nullable=False)
     password = db.Column(db.String(128), nullable=False)
     avatar = db.Column(db.String(200), nullable=True)  # Path to avatar image
-    announcements = db.relationship('Announcement', backref='author', lazy=True)
-    marketplace_posts = db.relationship('Marketplace', backref='author', lazy=True)
-    services = db.relationship('Service', backref='author', lazy=True)
+    posts = db.relationship('Post', back_populates='author', lazy=True)
+    announcements = db.relationship('Announcement', lazy=True, viewonly=True)
+    marketplace_posts = db.relationship('Marketplace', lazy=True, viewonly=True)
+    services = db.relationship('Service', lazy=True, viewonly=True)
     comments = db.relationship('Comment', backref='author', lazy=True)
+    stats = db.relationship('UserStats', uselist=False, lazy=True, viewonly=True)
 
-class Announcement(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    category = db.Column(db.String(20))  # Announcements, General, MM Service
-    title = db.Column(db.String(100))
-    content = db.Column(db.Text)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    date = db.Column(db.String(20))
+    @property
+    def post_count(self):
+        return self.stats.post_count if self.stats else 0
 
-class Marketplace(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    category = db.Column(db.String(20))  # Buyers, Sellers
-    title = db.Column(db.String(100))
-    description = db.Column(db.Text)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    price = db.Column(db.String(20))
-    date = db.Column(db.String(20))
+    @property
+    def comment_count(self):
+        return self.stats.comments if self.stats else 0
 
-class Service(db.Model):
+class Post(db.Model):
+    """All forum posts in one table; post_type is the route name of the section."""
     id = db.Column(db.Integer, primary_key=True)
-    category = db.Column(db.String(20))  # Buy, Sell
+    post_type = db.Column(db.String(20), nullable=False)  # announcements, marketplace, services
+    # category and user_id keep their old value when changed (active_history), so the
+    # counter listeners know which CategoryStats/UserStats rows to move a post out of
+    category = db.column_property(db.Column(db.String(20)), active_history=True)
     title = db.Column(db.String(100))
-    description = db.Column(db.Text)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    body = db.Column(db.Text)
+    user_id = db.column_property(db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False), active_history=True)
     price = db.Column(db.String(20))
-    date = db.Column(db.String(20))
+    date = db.Column(Timestamp)
+    legacy_id = db.Column(db.Integer)  # id in the pre-unification per-type table, for old URLs
+    # Bumped by any write to the post or its comments: the post page's cache version
+    updated_at = db.Column(db.Float, nullable=False, default=time.time, onupdate=time.time, server_default='0')
+    author = db.relationship('User', back_populates='posts')
+    comments = db.relationship('Comment', back_populates='post', lazy=True, cascade='all, delete-orphan')
+    __mapper_args__ = {'polymorphic_on': post_type}
+    __table_args__ = (
+        db.Index('ix_post_post_type_category_date', 'post_type', 'category', 'date'),
+        db.Index('ix_post_user_id_date', 'user_id', 'date'),
+        db.Index('ix_post_date', 'date'),
+        db.Index('ix_post_post_type_legacy_id', 'post_type', 'legacy_id'),
+        # Change feed filtered by type, or type and category: an id range in id order
+        db.Index('ix_post_post_type_id', 'post_type', 'id'),
+        db.Index('ix_post_post_type_category_id', 'post_type', 'category', 'id'),
+    )
+
+class Announcement(Post):
+    # Categories: Announcements, General, MM Service
+    __mapper_args__ = {'polymorphic_identity': 'announcements'}
+    content = db.synonym('body')
+
+class Marketplace(Post):
+    # Categories: Buyers, Sellers
+    __mapper_args__ = {'polymorphic_identity': 'marketplace'}
+    description = db.synonym('body')
+
+class Service(Post):
+    # Categories: Buy, Sell
+    __mapper_args__ = {'polymorphic_identity': 'services'}
+    description = db.synonym('body')
 
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    post_type = db.Column(db.String(20))  # announcement, marketplace, service
-    post_id = db.Column(db.Integer)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False)
+    user_id = db.column_property(db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False), active_history=True)
     content = db.Column(db.Text)
-    date = db.Column(db.String(20))
\ No newline at end of file
+    date = db.Column(Timestamp)
+    post = db.relationship('Post', back_populates='comments')
+    __table_args__ = (
+        db.Index('ix_comment_post_id_date', 'post_id', 'date'),
+        db.Index('ix_comment_user_id_date', 'user_id', 'date'),
+    )
+
+class CategoryStats(db.Model):
+    """Denormalized post counter per (post_type, category), maintained on flush.
+
+    updated_at is bumped by any write to a post in the category or to its
+    comments, so it doubles as the category's cache version.
+    """
+    post_type = db.Column(db.String(20), primary_key=True)  # announcements, marketplace, services
+    category = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.Float, nullable=False, default=time.time, server_default='0')
+
+class UserStats(db.Model):
+    """Denormalized per-user counters, maintained on flush like CategoryStats.
+
+    The per-type post counters are named after the post_type they count, so
+    author headers read one row however many posts the user has made.
+    updated_at is bumped whenever the counters change.
+    """
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    announcements = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    marketplace = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    services = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    comments = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_post_at = db.Column(Timestamp)
+    updated_at = db.Column(db.Float, nullable=False, default=time.time, server_default='0')
+
+    @property
+    def post_count(self):
+        return self.announcements + self.marketplace + self.services
+
+class CaptchaChallenge(db.Model):
+    """The answer to an issued CAPTCHA, kept server-side where every worker can check it.
+
+    The session only holds the random id. A challenge is used up by its first
+    answer, right or wrong; ones nobody answered are purged once expired.
+    """
+    id = db.Column(db.String(32), primary_key=True)
+    code = db.Column(db.String(10), nullable=False)
+    expires_at = db.Column(db.Float, nullable=False)  # time.time()
+    __table_args__ = (
+        db.Index('ix_captcha_challenge_expires_at', 'expires_at'),
+    )
+
+# Route post_type -> model
+POST_MODELS = {
+    'announcements': Announcement,
+    'marketplace': Marketplace,
+    'services': Service
+}
+
+def _apply_category_delta(connection, post_type, category, delta, now):
+    """Add delta to a counter row and stamp it inside the current transaction, creating it if missing."""
+    table = CategoryStats.__table__
+    result = connection.execute(
+        table.update()
+        .where(table.c.post_type == post_type, table.c.category == category)
+        .values(count=table.c.count + delta, updated_at=now)
+    )
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(post_type=post_type, category=category, count=max(delta, 0), updated_at=now))
+
+@event.listens_for(Session, 'after_flush')
+def update_category_stats(session, flush_context):
+    """Keep CategoryStats in step with post inserts, deletes and category changes,
+    and stamp every category whose posts or comments were written, and every
+    post whose comments were (posts stamp their own writes through onupdate)."""
+    deltas = Counter()
+    touched = set()
+    commented = set()
+    for obj in session.new:
+        if isinstance(obj, Post):
+            deltas[(obj.post_type, obj.category)] += 1
+        elif isinstance(obj, Comment):
+            commented.add(obj.post_id)
+    for obj in session.deleted:
+        if isinstance(obj, Post):
+            deltas[(obj.post_type, obj.category)] -= 1
+        elif isinstance(obj, Comment):
+            commented.add(obj.post_id)
+    for obj in session.dirty:
+        if isinstance(obj, Post) and session.is_modified(obj):
+            touched.add((obj.post_type, obj.category))
+            history = inspect(obj).attrs.category.history
+            if history.has_changes():
+                for old in history.deleted:
+                    deltas[(obj.post_type, old)] -= 1
+                for new in history.added:
+                    deltas[(obj.post_type, new)] += 1
+        elif isinstance(obj, Comment) and session.is_modified(obj):
+            commented.add(obj.post_id)
+    if not deltas and not touched and not commented:
+        return
+    connection = session.connection()
+    touched.update(deltas)
+    now = time.time()
+    if commented:
+        rows = connection.execute(select(Post.post_type, Post.category).where(Post.id.in_(commented)).distinct())
+        touched.update((post_type, category) for post_type, category in rows)
+        connection.execute(Post.__table__.update().where(Post.__table__.c.id.in_(commented)).values(updated_at=now))
+    for post_type, category in touched:
+        if category is not None:
+            _apply_category_delta(connection, post_type, category, deltas[(post_type, category)], now)
+
+def _count_user_rows(connection, user_id):
+    """A user's UserStats values counted from the post and comment tables, on their user_id indexes."""
+    counts = dict(connection.execute(
+        select(Post.post_type, func.count(Post.id)).where(Post.user_id == user_id).group_by(Post.post_type)
+    ).all())
+    values = {post_type: counts.get(post_type, 0) for post_type in POST_MODELS}
+    values['comments'] = connection.execute(select(func.count(Comment.id)).where(Comment.user_id == user_id)).scalar()
+    values['last_post_at'] = connection.execute(select(func.max(Post.date)).where(Post.user_id == user_id)).scalar()
+    return values
+
+def _apply_user_delta(connection, user_id, deltas, newest_post, recount_last_post):
+    """Add counter deltas to a user's row inside the current transaction, creating it if missing."""
+    table = UserStats.__table__
+    values = {name: table.c[name] + delta for name, delta in deltas.items() if delta}
+    if recount_last_post:
+        values['last_post_at'] = select(func.max(Post.date)).where(Post.user_id == user_id).scalar_subquery()
+    elif newest_post is not None:
+        newest = literal(newest_post, Timestamp)
+        values['last_post_at'] = case(
+            (table.c.last_post_at.is_(None), newest), (table.c.last_post_at < newest, newest), else_=table.c.last_post_at
+        )
+    if not values:
+        return
+    values['updated_at'] = time.time()
+    result = connection.execute(table.update().where(table.c.user_id == user_id).values(values))
+    if result.rowcount == 0:
+        # First write since the stats were built: count from the tables, which already include this flush
+        connection.execute(table.insert().values(user_id=user_id, **_count_user_rows(connection, user_id)))
+
+@event.listens_for(Session, 'after_flush')
+def update_user_stats(session, flush_context):
+    """Keep UserStats in step with post and comment inserts, deletes and author changes."""
+    removed = {obj.id for obj in session.deleted if isinstance(obj, User)}
+    deltas = defaultdict(Counter)
+    newest = {}
+    recount = set()  # users whose last_post_at can only be found again by looking
+    for obj in session.new:
+        if isinstance(obj, Post):
+            deltas[obj.user_id][obj.post_type] += 1
+            if obj.date is not None and (obj.user_id not in newest or obj.date > newest[obj.user_id]):
+                newest[obj.user_id] = obj.date
+        elif isinstance(obj, Comment):
+            deltas[obj.user_id]['comments'] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Post):
+            deltas[obj.user_id][obj.post_type] -= 1
+            recount.add(obj.user_id)
+        elif isinstance(obj, Comment):
+            deltas[obj.user_id]['comments'] -= 1
+    for obj in session.dirty:
+        if not isinstance(obj, (Post, Comment)) or not session.is_modified(obj):
+            continue
+        column = obj.post_type if isinstance(obj, Post) else 'comments'
+        history = inspect(obj).attrs.user_id.history
+        for old in history.deleted:
+            deltas[old][column] -= 1
+        for new in history.added:
+            deltas[new][column] += 1
+        if isinstance(obj, Post) and (history.has_changes() or inspect(obj).attrs.date.history.has_changes()):
+            recount.update(history.deleted)
+            recount.add(obj.user_id)
+    users = {user_id for user_id in set(deltas) | recount if user_id is not None} - removed
+    if not users and not removed:
+        return
+    connection = session.connection()
+    if removed:
+        connection.execute(UserStats.__table__.delete().where(UserStats.__table__.c.user_id.in_(removed)))
+    for user_id in users:
+        _apply_user_delta(connection, user_id, deltas[user_id], newest.get(user_id), user_id in recount)
+
+def get_comment_counts(post_ids):
+    """Count comments for many posts with a single GROUP BY query."""
+    if not post_ids:
+        return {}
+    rows = db.session.query(Comment.post_id, func.count(Comment.id)).filter(
+        Comment.post_id.in_(post_ids)
+    ).group_by(Comment.post_id).all()
+    return dict(rows)
+
+def get_user_stats(user_id):
+    """A user's counter row, or None before their first post or comment."""
+    return db.session.get(UserStats, user_id)
+
+def get_post_version(post_id):
+    """Cache version of a post page: the later of the post's stamp and its author's counter stamp.
+
+    None if there is no such post.
+    """
+    row = db.session.execute(
+        select(Post.updated_at, UserStats.updated_at).outerjoin(UserStats, UserStats.user_id == Post.user_id).where(Post.id == post_id)
+    ).first()
+    return max(row[0], row[1] or 0.0) if row else None
+
+def get_user_post_count(user_id):
+    """Posts by one user across all types, from their UserStats row."""
+    stats = get_user_stats(user_id)
+    return stats.post_count if stats else 0
+
+def rebuild_category_stats(session=None):
+    """Recompute every CategoryStats row from the post table (drift repair).
+
+    Runs on db.session unless given another session, e.g. one joined to a migration's transaction.
+    """
+    session = session or db.session
+    session.query(CategoryStats).delete()
+    rows = session.query(Post.post_type, Post.category, func.count(Post.id)).group_by(Post.post_type, Post.category).all()
+    for post_type, category, count in rows:
+        if category is not None:
+            session.add(CategoryStats(post_type=post_type, category=category, count=count))
+    session.commit()
+
+def rebuild_user_stats(session=None):
+    """Recompute every UserStats row from the post and comment tables (drift repair).
+
+    Takes an optional session like rebuild_category_stats.
+    """
+    session = session or db.session
+    session.query(UserStats).delete()
+    stats = {}
+
+    def row(user_id):
+        if user_id not in stats:
+            stats[user_id] = UserStats(user_id=user_id, announcements=0, marketplace=0, services=0, comments=0)
+        return stats[user_id]
+
+    posts = session.query(Post.user_id, Post.post_type, func.count(Post.id), func.max(Post.date)).group_by(Post.user_id, Post.post_type)
+    for user_id, post_type, count, last_post_at in posts:
+        if post_type in POST_MODELS:
+            user_stats = row(user_id)
+            setattr(user_stats, post_type, count)
+            if last_post_at is not None and (user_stats.last_post_at is None or last_post_at > user_stats.last_post_at):
+                user_stats.last_post_at = last_post_at
+    for user_id, count in session.query(Comment.user_id, func.count(Comment.id)).group_by(Comment.user_id):
+        row(user_id).comments = count
+    session.add_all(stats.values())
+    session.commit()
@@ -0,0 +1,95 @@
+# pagination.py
+from sqlalchemy import tuple_
+from datetime import datetime, timedelta
+import base64
+import binascii
+import json
+import re
+
+
+def encode_cursor(post):
+    """Encode a post's or comment's (date, id) sort key as an opaque URL-safe cursor."""
+    raw = json.dumps([post.date.isoformat(sep=' '), post.id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor back to a (datetime, id) tuple, or None if it is empty or malformed."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        date, post_id = json.loads(raw)
+        if not isinstance(date, str) or not isinstance(post_id, int):
+            return None
+        return datetime.fromisoformat(date), post_id
+    except (binascii.Error, ValueError, TypeError):
+        return None
+
+
+class KeysetPage:
+    """One page of a (date DESC, id DESC) keyset walk with opaque next/prev cursors."""
+
+    def __init__(self, items, next_cursor, prev_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+
+def keyset_paginate(query, model, after=None, before=None, per_page=10):
+    """Fetch the page of query following the `after` cursor or preceding the `before` cursor.
+
+    Rows are ordered newest first on (date, id), so each page is a single index
+    range scan regardless of how deep into the listing it is. An empty `after`
+    starts from the newest row, and so does any cursor that does not decode.
+    """
+    sort_key = tuple_(model.date, model.id)
+    before_key = decode_cursor(before)
+    if before_key is not None:
+        query = query.filter(sort_key > before_key)
+        rows = query.order_by(model.date.asc(), model.id.asc()).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        next_cursor = encode_cursor(items[-1]) if items else None
+        prev_cursor = encode_cursor(items[0]) if items and has_more else None
+        return KeysetPage(items, next_cursor, prev_cursor)
+
+    key = decode_cursor(after)
+    if key is not None:
+        query = query.filter(sort_key < key)
+    rows = query.order_by(model.date.desc(), model.id.desc()).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    items = rows[:per_page]
+    next_cursor = encode_cursor(items[-1]) if items and has_more else None
+    prev_cursor = encode_cursor(items[0]) if items and key is not None else None
+    return KeysetPage(items, next_cursor, prev_cursor)
+
+
+RELATIVE_AGE = re.compile(r'^(\d+)([hdw])$')
+AGE_UNITS = {'h': 'hours', 'd': 'days', 'w': 'weeks'}
+
+
+def parse_date_param(value, end=False):
+    """Parse a since/until query parameter, or return None if it is missing or invalid.
+
+    Accepts an ISO date or datetime, or an age such as 24h, 7d or 2w. Relative
+    values are rounded down to the minute so cache keys stay stable. A bare date
+    used as an exclusive end (`end=True`) covers the whole of that day.
+    """
+    if not value:
+        return None
+    age = RELATIVE_AGE.match(value)
+    if age:
+        now = datetime.now().replace(second=0, microsecond=0)
+        try:
+            return now - timedelta(**{AGE_UNITS[age.group(2)]: int(age.group(1))})
+        except (OverflowError, ValueError):
+            # An age reaching past datetime.min is as good as no bound at all.
+            return None
+    try:
+        parsed = datetime.fromisoformat(value)
+        if end and len(value) == 10:
+            parsed += timedelta(days=1)
+    except (OverflowError, ValueError):
+        return None
+    return parsed.replace(microsecond=0)
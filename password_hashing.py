@@ -0,0 +1,112 @@
+# password_hashing.py
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import bcrypt
+import multiprocessing
+import os
+import threading
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue is full or a hash does not finish within the timeout."""
+
+
+def _hash_password(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check_password(pw_hash, password):
+    return bcrypt.checkpw(password.encode('utf-8'), pw_hash.encode('utf-8'))
+
+
+class PasswordHasher:
+    """bcrypt hashing backed by a process pool, with a bounded queue and a timeout.
+
+    Hashes are compatible with Flask-Bcrypt. With ``workers=0`` everything runs
+    inline on the calling thread. At most ``max_pending`` hashes may be queued or
+    running; beyond that, and when a hash takes longer than ``timeout`` seconds,
+    HashingBusy is raised so the route can ask the user to retry. A job that
+    timed out keeps its slot until it really finishes. If a pool process dies,
+    the pool is replaced rather than failing every later hash.
+    """
+
+    def __init__(self, rounds=12, workers=None, max_pending=None, timeout=10.0):
+        self.rounds = rounds
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_pending = max_pending or max(self.workers, 1) * 4
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        # Pools are never shared across a fork; each worker process builds its own
+        with self._lock:
+            if self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+                self._pid = os.getpid()
+            return self._executor
+
+    def _discard(self, executor):
+        """Drop a broken pool so the next hash starts a fresh one."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+                self._pid = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, fn, *args):
+        executor = self.executor
+        try:
+            return executor, executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._discard(executor)
+            executor = self.executor
+            return executor, executor.submit(fn, *args)
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy('Password hashing queue is full')
+        try:
+            executor, future = self._submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # Free the slot when the job is done or cancelled, not when we stop waiting for it
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()  # only stops a job that has not started yet
+            raise HashingBusy('Password hashing timed out')
+        except BrokenProcessPool:
+            self._discard(executor)
+            raise HashingBusy('Password hashing pool restarted')
+
+    def hash(self, password):
+        return self._run(_hash_password, password, self.rounds)
+
+    def check(self, pw_hash, password):
+        return self._run(_check_password, pw_hash, password)
+
+    def hash_many(self, passwords):
+        """Hash several passwords in parallel (for seeding); no queue bound or timeout."""
+        if not self.workers:
+            return [_hash_password(password, self.rounds) for password in passwords]
+        executor = self.executor
+        try:
+            return list(executor.map(_hash_password, passwords, [self.rounds] * len(passwords)))
+        except BrokenProcessPool:
+            self._discard(executor)
+            raise
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown()
+            self._executor = None
+            self._pid = None
@@ -1,16 +1,25 @@
 # populate_db.py
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
-from models import db, User, Announcement, Marketplace, Service, Comment
-from datetime import datetime, timedelta
-import random
+from password_hashing import PasswordHasher
+from db_config import configure_database, apply_sqlite_pragmas
+from models import db, User, Announcement, Marketplace, Service, Comment, rebuild_category_stats, rebuild_user_stats
+import search_index  # creates/drops the full-text index alongside the tables
+from search_index import drop_search_index, rebuild_search_index
+from seed_data import (
+    SEED_USERS, ANNOUNCEMENT_CATEGORIES, MARKETPLACE_CATEGORIES, SERVICE_CATEGORIES,
+    announcement_rows, marketplace_rows, service_rows, comment_rows
+)
+import argparse
+import os
 import logging
+import time
 
 # Configuration variables
 NUM_POSTS_PER_CATEGORY = 100
 NUM_COMMENTS_PER_POST = 2
 NUM_IAB_SELLER_POSTS = 3
+BULK_BATCH_SIZE = 10000  # rows per executemany / commit
 
 # Configure logging
 logging.basicConfig(
@@ -24,412 +33,150 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///database.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-bcrypt = Bcrypt(app)
-
-def generate_text(template, replacements):
-    """Generate text by replacing placeholders in template with random choices from replacements."""
-    try:
-        text = template
-        for key, values in replacements.items():
-            text = text.replace(f"{{{key}}}", random.choice(values))
-        return text.strip()
-    except Exception as e:
-        logger.error(f"Error generating text for template '{template}': {str(e)}")
-        return "Generated text error"
-
-def init_db():
+configure_database(app)
+password_hasher = PasswordHasher(rounds=int(os.environ.get('BCRYPT_LOG_ROUNDS', 12)))
+
+def seller_rows(category, count, user_ids):
+    return marketplace_rows(category, count, user_ids, iab_posts=NUM_IAB_SELLER_POSTS)
+
+
+def batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def insert_rows_bulk(connection, model, rows, batch_size):
+    """Insert rows with one executemany per batch and one commit per batch; returns the new ids."""
+    ids = []
+    statement = model.__table__.insert().returning(model.__table__.c.id, sort_by_parameter_order=True)
+    post_type = model.__mapper__.polymorphic_identity
+    if post_type is not None:
+        # Core inserts skip the ORM, so fill in the discriminator ourselves
+        statement = statement.values(post_type=post_type)
+    for batch in batched(rows, batch_size):
+        ids.extend(connection.execute(statement, batch).scalars().all())
+        connection.commit()
+        logger.info(f"Inserted {len(ids)} {model.__tablename__} rows")
+    return ids
+
+
+def insert_rows_orm(model, rows, batch_size):
+    """Insert rows as ORM objects (fires model events) with one commit per batch; returns the new ids."""
+    ids = []
+    for batch in batched(rows, batch_size):
+        objects = [model(**row) for row in batch]
+        db.session.add_all(objects)
+        db.session.commit()
+        ids.extend(obj.id for obj in objects)
+        logger.info(f"Inserted {len(ids)} {model.__tablename__} rows")
+    return ids
+
+
+def set_load_pragmas(connection):
+    """Trade durability for speed while seeding: a crash mid-load just means reseeding."""
+    if connection.dialect.name != 'sqlite':
+        return
+    connection.exec_driver_sql('PRAGMA synchronous=OFF')
+    connection.exec_driver_sql('PRAGMA cache_size=-200000')
+    connection.exec_driver_sql('PRAGMA temp_store=MEMORY')
+
+
+def restore_pragmas(connection):
+    """Put the pooled connection back on the shared settings from db_config."""
+    if connection.dialect.name != 'sqlite':
+        return
+    apply_sqlite_pragmas(connection.connection)
+    connection.exec_driver_sql('PRAGMA temp_store=DEFAULT')
+
+
+def init_db(num_posts=NUM_POSTS_PER_CATEGORY, num_comments=NUM_COMMENTS_PER_POST, bulk=True, batch_size=BULK_BATCH_SIZE):
     with app.app_context():
+        started = time.perf_counter()
         logger.info("Starting database initialization")
         db.drop_all()
         logger.info("Dropped existing tables")
         db.create_all()
         logger.info("Created new tables")
 
-        # Create 10 user profiles
-        users = [
-            ('DarkHacker', 'pass123', 'darkhacker.jpg'),
-            ('CyberGhost', 'ghost456', 'cyberghost.jpg'),
-            ('ShadowV', 'shadow789', 'shadowv.jpg'),
-            ('AnonX', 'anon101', 'anonx.jpg'),
-            ('N3tRunn3r', 'runner202', 'netrunner.jpg'),
-            ('Crypt0King', 'king303', 'cryptoking.jpg'),
-            ('ZeroByte', 'zero404', 'zerobyte.jpg'),
-            ('HackSavvy', 'savvy505', 'hacksavvy.jpg'),
-            ('GhostRider', 'rider606', 'ghostrider.jpg'),
-            ('DataViper', 'viper707', 'dataviper.jpg'),
-        ]
-        for username, password, avatar in users:
+        # Hash all seed passwords in parallel across the process pool
+        hashed_passwords = password_hasher.hash_many([password for _, password, _ in SEED_USERS])
+        for (username, password, avatar), hashed_password in zip(SEED_USERS, hashed_passwords):
             if not User.query.filter_by(username=username).first():
-                hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
                 user = User(username=username, password=hashed_password, avatar=avatar)
                 db.session.add(user)
                 logger.info(f"Added user: {username}")
         try:
             db.session.commit()
-            logger.info("Committed 10 users to database")
+            logger.info(f"Committed {len(SEED_USERS)} users to database")
         except Exception as e:
             logger.error(f"Error committing users: {str(e)}")
             db.session.rollback()
-            return
+            raise
 
         user_ids = [user.id for user in User.query.all()]
 
-        # Generate timestamps (within last 30 days)
-        def random_timestamp():
-            days_ago = random.randint(0, 30)
-            hours_ago = random.randint(0, 23)
-            minutes_ago = random.randint(0, 59)
-            seconds_ago = random.randint(0, 59)
-            return (datetime.now() - timedelta(days=days_ago, hours=hours_ago, minutes=minutes_ago, seconds=seconds_ago)).strftime('%Y-%m-%d %H:%M:%S')
-
-        # Templates and replacements for text generation
-        announcement_templates = {
-            "title": [
-                "{action} {item}",
-                "{item} {status} Update",
-                "New {item} Guidelines",
-                "Discuss {item} Trends"
-            ],
-            "content": [
-                "{action} {item}. Contact me for details.",
-                "Recent {item} trends show {status}. Share your thoughts!",
-                "Offering {service} for secure {item} deals. PM to join.",
-                "Tips: Always verify {item} before trading."
-            ]
-        }
-        announcement_replacements = {
-            "action": ["New rules for", "Tips for trading", "Offering", "Discussing"],
-            "item": ["data breaches", "phishing kits", "escrow services", "cyber-crime tools"],
-            "status": ["increased activity", "new methods", "high demand", "stricter rules"],
-            "service": ["middleman services", "secure deals", "escrow", "verification"]
-        }
-        marketplace_templates = {
-            "title": {
-                "Buyers": [
-                    "Need {item}, High Budget",
-                    "Looking for {item}",
-                    "Buying Fresh {item}",
-                    "Seeking {item} ASAP"
-                ],
-                "Sellers": [
-                    "Selling {item}",
-                    "Fresh {item} Available",
-                    "{item} for Sale, {status}",
-                    "High-Quality {item} Drop"
-                ]
-            },
-            "description": {
-                "Buyers": [
-                    "Looking for {item}, willing to pay {price}. PM with offers.",
-                    "Need clean {item}, urgent. DM me for details.",
-                    "Seeking reliable {item} source, escrow available.",
-                    "Buying {item}, top dollar for quality."
-                ],
-                "Sellers": [
-                    "Selling {item}, high quality, {status}. PM for details.",
-                    "Fresh batch of {item}, ready to use. Contact me!",
-                    "{item} available, {status}. Escrow accepted.",
-                    "High-validity {item}, bulk discounts available."
-                ]
-            }
-        }
-        marketplace_replacements = {
-            "item": ["CC dumps", "PayPal accounts", "gift card codes", "data leaks", "RDP credentials", "VPN logins"],
-            "status": ["clean and verified", "high balance", "freshly obtained", "limited stock"],
-            "price": ["$100-$500", "$50-$200", "negotiable", "top dollar"]
-        }
-        iab_marketplace_templates = {
-            "title": ["Access to {company} Network", "Selling {company} Credentials", "{company} IAB Drop"],
-            "description": ["Compromised {company} access, {status}. PM for secure deal.", "Selling {company} network credentials, clean. Escrow only."]
-        }
-        iab_replacements = {
-            "company": ["Acme Corp", "TechTrend Inc", "GlobalSys Ltd", "DataCore Solutions"],
-            "status": ["verified admin access", "full network control", "recent breach", "exclusive access"]
-        }
-        # Predefined IAB posts for Sellers
-        predefined_iab_posts = [
-            {
-                "title": "TD Bank RDP Access",
-                "description": "Company: TD Bank\nRevenue: $1.64 billion\nIndustry: Banking\nAccess type: RDP\nPrice: DM me for price, serious buyers only, MM accepted",
-                "price": "DM for price"
-            },
-            {
-                "title": "Selling SMB Access to RBC Bank",
-                "description": "Selling SMB access to RBC bank\nRevenue: $5.21\nIndustry: Banking\nCusomters: over 10 million\nCountry: Canada\n\n$12,000 Price is non-negotiatiable, dm me",
-                "price": "$12000"
-            },
-            {
-                "title": "Capital Freight Co. Access",
-                "description": "Selling access to Capital Freight Co. (Texas-based logistics)\nRevenue: ~$900M\nAccess: Full RDP, domain admin via svc_x backup creds\nExtras: Internal invoices, mapped drives, Outlook web creds\nEDR: minimal – Defender only\nPrice: 0.6 BTC firm, BTC only, DM me quick",
-                "price": "0.6 BTC"
-            },
-            {
-                "title": "AspenWell 生物科技有限公司 访问",
-                "description": "公司：AspenWell Biotech Ltd\n地点：荷兰\n收入：$1.3 亿美元\n访问类型：VPN > 内部 RDP > DA\n额外信息：SharePoint 暴露，部署了 RMM 代理\n安全：内部无防病毒软件，未触发日志\n价格：1.05 BTC，支持 escrow 支付（需与卖家协商）\n仅向一名买家出售。",
-                "price": "1.05 BTC"
-            },
-            {
-                "title": "GLOBEX Holdings VPN Access",
-                "description": "got corp vpn + psremote into GLOBEX Holdings, some UK fintech trash\nDA rights, creds pulled from exposed git repo (lol)\nno EDR, just weak-ass AV. internal docs and finance data wide open\nnot waitin long. 0.7 BTC. msg only if u got coin",
-                "price": "0.7 BTC"
-            },
-            {
-                "title": "Arctic Foods Group RDP Access",
-                "description": "ACCESS TO ARCTIC FOODS GROUP\n– Canada HQ’d food distributor\n– RDP w/ DA, access stable 4 days\n– billing, inventory, HR PDFs open\n– Sophos AV but neutered\nRevenue: 2.1B CAD\nPrice: 1.2 BTC\nFAST BUYERS ONLY. No vouches, no timewasters.",
-                "price": "1.2 BTC"
-            },
-            {
-                "title": "Silverline Capital Partners Access",
-                "description": "Company: Silverline Capital Partners (NY Private Equity firm)\nRevenue: approx $500M AUM\nAccess: RDP into domain w/ admin rights\nDetected: not yet, 3 days stable\nBonus: Access to doc mgmt system + Zoom internal creds\nSelling for 0.9 BTC – will include persistence script\nDM to deal",
-                "price": "0.9 BTC"
-            },
-            {
-                "title": "베리타스 헬스 파트너스 액세스",
-                "description": "판매 중: Veritas Health Partners, 캐나다\n매출: 약 $430M\n산업: 의료\n접근 유형: VPN + 작동 중인 RDP\n권한: 로컬 관리자 권한 및 내부 공유 액세스\n탐지되지 않음 – 6일 연속 가동 중\n가격: 0.58 BTC 고정 가격",
-                "price": "0.58 BTC"
-            },
-            {
-                "title": "Portwell Maritime Group Access",
-                "description": "Selling access to Portwell Maritime Group (Singapore)\nAccess: DA creds via exposed RDP svc acct\nRevenue: Est. $2B\nIndustry: Shipping / Transport\nExtras: payroll exports + crew schedules\nContact: DM if you’ve dealt before. Fast buyers only.",
-                "price": "DM for price"
-            },
-            {
-                "title": "Доступ к недвижимости Monarch",
-                "description": "Компания: Monarch Real Estate Investments\nМестонахождение: США, Нью-Йорк\nВыручка: 380 млн долларов\nДоступ: Citrix > внутренний RDP > DA\nНабор постоянных файлов, нетронутый более 4 дней\nДоступны резервные копии документов + договоры аренды клиентов\nЦена: 0,7 BTC, только для серьезных людей",
-                "price": "0.7 BTC"
-            }
-        ]
-        service_templates = {
-            "title": {
-                "Buy": [
-                    "Need {service} Expert",
-                    "Seeking {service}",
-                    "Looking for {service} Pro",
-                    "Requesting {service}"
-                ],
-                "Sell": [
-                    "Offering {service}",
-                    "{service} Available",
-                    "Professional {service}",
-                    "{service} for Hire"
-                ]
-            },
-            "description": {
-                "Buy": [
-                    "Need {service} for a project, {status}. PM with rates.",
-                    "Looking for reliable {service}, high budget. DM me.",
-                    "Seeking {service} expert, escrow available.",
-                    "Want {service}, urgent. Contact me!"
-                ],
-                "Sell": [
-                    "Providing {service}, {status}. PM for pricing.",
-                    "{service} with fast delivery, contact me.",
-                    "Professional {service}, {status}. Escrow accepted.",
-                    "Custom {service}, DM for details."
-                ]
-            }
-        }
-        service_replacements = {
-            "service": ["DDoS attacks", "phishing campaigns", "malware development", "SQL injection", "botnet rental"],
-            "status": ["fast and reliable", "guaranteed results", "24/7 support", "custom solutions"]
-        }
-        comment_templates = [
-            "Interested in {item}, PM sent!",
-            "Is {item} still available?",
-            "Can you verify {item} quality?",
-            "DM me for {item} details."
-        ]
-        comment_replacements = {
-            "item": ["this deal", "your service", "the credentials", "this data"]
-        }
-
-        # Populate Announcements (NUM_POSTS_PER_CATEGORY per category: Announcements, General, MM Service)
-        categories = ['Announcements', 'General', 'MM Service']
-        for category in categories:
-            logger.info(f"Populating {category} announcements with {NUM_POSTS_PER_CATEGORY} posts")
-            for i in range(0, NUM_POSTS_PER_CATEGORY, 5):  # Batch of 5
-                batch_size = min(5, NUM_POSTS_PER_CATEGORY - i)
-                titles = [generate_text(random.choice(announcement_templates["title"]), announcement_replacements)[:100] for _ in range(batch_size)]
-                contents = [generate_text(random.choice(announcement_templates["content"]), announcement_replacements)[:200] for _ in range(batch_size)]
-                for j, (title, content) in enumerate(zip(titles, contents)):
-                    ann = Announcement(
-                        category=category,
-                        title=title,
-                        content=content,
-                        user_id=random.choice(user_ids),
-                        date=random_timestamp()
-                    )
-                    db.session.add(ann)
-                    logger.info(f"Added {category} announcement {i + j + 1}/{NUM_POSTS_PER_CATEGORY}: {title[:30]}...")
-                try:
-                    db.session.commit()
-                    logger.info(f"Committed {category} announcements {i + 1}-{i + batch_size}")
-                except Exception as e:
-                    logger.error(f"Error committing {category} announcements: {str(e)}")
-                    db.session.rollback()
-                    return
-
-        # Populate Marketplace (NUM_POSTS_PER_CATEGORY per category: Buyers, Sellers)
-        categories = ['Buyers', 'Sellers']
-        for category in categories:
-            logger.info(f"Populating {category} marketplace posts with {NUM_POSTS_PER_CATEGORY} posts")
-            if category == 'Sellers':
-                # Add predefined IAB posts
-                predefined_count = len(predefined_iab_posts)
-                for i, post in enumerate(predefined_iab_posts):
-                    market = Marketplace(
-                        category=category,
-                        title=post["title"][:100],
-                        description=post["description"][:200],
-                        user_id=random.choice(user_ids),
-                        price=post["price"],
-                        date=random_timestamp()
-                    )
-                    db.session.add(market)
-                    logger.info(f"Added {category} predefined IAB post {i + 1}/{predefined_count}: {post['title'][:30]}...")
-                try:
-                    db.session.commit()
-                    logger.info(f"Committed {predefined_count} predefined IAB posts for {category}")
-                except Exception as e:
-                    logger.error(f"Error committing predefined IAB posts: {str(e)}")
-                    db.session.rollback()
-                    return
-
-                # Add random IAB posts
-                iab_posts = min(NUM_IAB_SELLER_POSTS, NUM_POSTS_PER_CATEGORY - predefined_count)
-                for i in range(iab_posts):
-                    title = generate_text(random.choice(iab_marketplace_templates["title"]), iab_replacements)[:100]
-                    description = generate_text(random.choice(iab_marketplace_templates["description"]), iab_replacements)[:200]
-                    price = f"${random.randint(50, 1000)}"
-                    market = Marketplace(
-                        category=category,
-                        title=title,
-                        description=description,
-                        user_id=random.choice(user_ids),
-                        price=price,
-                        date=random_timestamp()
-                    )
-                    db.session.add(market)
-                    logger.info(f"Added {category} random IAB post {i + 1}/{iab_posts}: {title[:30]}...")
+        sources = [(Announcement, category, announcement_rows) for category in ANNOUNCEMENT_CATEGORIES]
+        sources += [(Marketplace, category, seller_rows) for category in MARKETPLACE_CATEGORIES]
+        sources += [(Service, category, service_rows) for category in SERVICE_CATEGORIES]
+        post_ids = []
+        total_comments = 0
+        try:
+            if bulk:
+                # One connection for the whole load so the pragmas apply to every batch.
+                # Search triggers are dropped during the load and the index is rebuilt in one pass.
                 try:
-                    db.session.commit()
-                    logger.info(f"Committed {iab_posts} random IAB posts for {category}")
-                except Exception as e:
-                    logger.error(f"Error committing random IAB posts: {str(e)}")
-                    db.session.rollback()
-                    return
-
-                # Add non-IAB posts to reach NUM_POSTS_PER_CATEGORY
-                for i in range(0, NUM_POSTS_PER_CATEGORY, 5):  # Batch of 5
-                    batch_size = min(5, NUM_POSTS_PER_CATEGORY - i)
-                    titles = [generate_text(random.choice(marketplace_templates["title"][category]), marketplace_replacements)[:100] for _ in range(batch_size)]
-                    descriptions = [generate_text(random.choice(marketplace_templates["description"][category]), marketplace_replacements)[:200] for _ in range(batch_size)]
-                    for j, (title, description) in enumerate(zip(titles, descriptions)):
-                        price = f"Offer ${random.randint(50, 500)}"
-                        market = Marketplace(
-                            category=category,
-                            title=title,
-                            description=description,
-                            user_id=random.choice(user_ids),
-                            price=price,
-                            date=random_timestamp()
-                        )
-                        db.session.add(market)
-                        logger.info(f"Added {category} marketplace post {i + j + 1}/{NUM_POSTS_PER_CATEGORY}: {title[:30]}...")
-                    try:
-                        db.session.commit()
-                        logger.info(f"Committed {category} marketplace posts {i + 1}-{i + batch_size}")
-                    except Exception as e:
-                        logger.error(f"Error committing {category} marketplace posts: {str(e)}")
-                        db.session.rollback()
-                        return
+                    with db.engine.connect() as connection:
+                        set_load_pragmas(connection)
+                        drop_search_index(connection)
+                        connection.commit()
+                        try:
+                            for model, category, generate in sources:
+                                logger.info(f"Populating {category} {model.__mapper__.polymorphic_identity} posts with {num_posts} posts")
+                                ids = insert_rows_bulk(connection, model, generate(category, num_posts, user_ids), batch_size)
+                                post_ids.extend(ids)
+                            logger.info(f"Populating comments ({num_comments} per post)")
+                            total_comments = len(insert_rows_bulk(connection, Comment, comment_rows(post_ids, num_comments, user_ids), batch_size))
+                        finally:
+                            connection.rollback()  # drops a failed batch; the others are committed
+                            restore_pragmas(connection)
+                finally:
+                    # Even after a failed load, or posts added later would never reach the index
+                    rebuild_search_index()
+                rebuild_category_stats()
+                rebuild_user_stats()
             else:
-                # Buyers: all non-IAB
-                for i in range(0, NUM_POSTS_PER_CATEGORY, 5):  # Batch of 5
-                    batch_size = min(5, NUM_POSTS_PER_CATEGORY - i)
-                    titles = [generate_text(random.choice(marketplace_templates["title"][category]), marketplace_replacements)[:100] for _ in range(batch_size)]
-                    descriptions = [generate_text(random.choice(marketplace_templates["description"][category]), marketplace_replacements)[:200] for _ in range(batch_size)]
-                    for j, (title, description) in enumerate(zip(titles, descriptions)):
-                        price = f"Offer ${random.randint(50, 500)}"
-                        market = Marketplace(
-                            category=category,
-                            title=title,
-                            description=description,
-                            user_id=random.choice(user_ids),
-                            price=price,
-                            date=random_timestamp()
-                        )
-                        db.session.add(market)
-                        logger.info(f"Added {category} marketplace post {i + j + 1}/{NUM_POSTS_PER_CATEGORY}: {title[:30]}...")
-                    try:
-                        db.session.commit()
-                        logger.info(f"Committed {category} marketplace posts {i + 1}-{i + batch_size}")
-                    except Exception as e:
-                        logger.error(f"Error committing {category} marketplace posts: {str(e)}")
-                        db.session.rollback()
-                        return
-
-        # Populate Services (NUM_POSTS_PER_CATEGORY per category: Buy, Sell)
-        categories = ['Buy', 'Sell']
-        for category in categories:
-            logger.info(f"Populating {category} service posts with {NUM_POSTS_PER_CATEGORY} posts")
-            for i in range(0, NUM_POSTS_PER_CATEGORY, 5):  # Batch of 5
-                batch_size = min(5, NUM_POSTS_PER_CATEGORY - i)
-                titles = [generate_text(random.choice(service_templates["title"][category]), service_replacements)[:100] for _ in range(batch_size)]
-                descriptions = [generate_text(random.choice(service_templates["description"][category]), service_replacements)[:200] for _ in range(batch_size)]
-                for j, (title, description) in enumerate(zip(titles, descriptions)):
-                    price = f"${random.randint(100, 2000)}" if category == 'Sell' else 'Negotiable'
-                    service = Service(
-                        category=category,
-                        title=title,
-                        description=description,
-                        user_id=random.choice(user_ids),
-                        price=price,
-                        date=random_timestamp()
-                    )
-                    db.session.add(service)
-                    logger.info(f"Added {category} service post {i + j + 1}/{NUM_POSTS_PER_CATEGORY}: {title[:30]}...")
-                try:
-                    db.session.commit()
-                    logger.info(f"Committed {category} service posts {i + 1}-{i + batch_size}")
-                except Exception as e:
-                    logger.error(f"Error committing {category} service posts: {str(e)}")
-                    db.session.rollback()
-                    return
-
-        # Populate Comments (NUM_COMMENTS_PER_POST per post)
-        logger.info(f"Populating comments ({NUM_COMMENTS_PER_POST} per post)")
-        announcement_ids = [(post.id, 'announcement') for post in Announcement.query.all()]
-        marketplace_ids = [(post.id, 'marketplace') for post in Marketplace.query.all()]
-        service_ids = [(post.id, 'service') for post in Service.query.all()]
-        all_posts = announcement_ids + marketplace_ids + service_ids
-        total_comments = len(all_posts) * NUM_COMMENTS_PER_POST
-        for i, (post_id, post_type) in enumerate(all_posts):
-            for j in range(NUM_COMMENTS_PER_POST):
-                content = generate_text(random.choice(comment_templates), comment_replacements)[:100]
-                comment = Comment(
-                    post_type=post_type,
-                    post_id=post_id,
-                    user_id=random.choice(user_ids),
-                    content=content,
-                    date=random_timestamp()
-                )
-                db.session.add(comment)
-                logger.info(f"Added comment {j + 1}/{NUM_COMMENTS_PER_POST} for {post_type} post {post_id}: {content[:30]}...")
-            try:
-                db.session.commit()
-                logger.info(f"Committed comments for {post_type} post {i + 1}/{len(all_posts)}")
-            except Exception as e:
-                logger.error(f"Error committing comments for {post_type} post {post_id}: {str(e)}")
-                db.session.rollback()
-                return
+                for model, category, generate in sources:
+                    logger.info(f"Populating {category} {model.__mapper__.polymorphic_identity} posts with {num_posts} posts")
+                    ids = insert_rows_orm(model, generate(category, num_posts, user_ids), batch_size)
+                    post_ids.extend(ids)
+                logger.info(f"Populating comments ({num_comments} per post)")
+                total_comments = len(insert_rows_orm(Comment, comment_rows(post_ids, num_comments, user_ids), batch_size))
+        except Exception as e:
+            logger.error(f"Error populating database: {str(e)}")
+            db.session.rollback()
+            raise
 
-        total_posts = NUM_POSTS_PER_CATEGORY * (len(['Announcements', 'General', 'MM Service']) + len(['Buyers']) + len(['Buy', 'Sell'])) + (NUM_POSTS_PER_CATEGORY + predefined_count + NUM_IAB_SELLER_POSTS)
+        total_posts = len(post_ids)
+        elapsed = time.perf_counter() - started
+        total_rows = len(user_ids) + total_posts + total_comments
         logger.info("Database population completed successfully")
-        print(f"Database initialized with 10 users, {total_posts} posts, and {total_comments} comments.")
+        print(f"Database initialized with {len(user_ids)} users, {total_posts} posts, and {total_comments} comments.")
+        print(f"Inserted {total_rows} rows in {elapsed:.2f}s ({total_rows / elapsed:.0f} rows/s).")
 
 if __name__ == '__main__':
-    init_db()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Drop and reseed the forum database.')
+    parser.add_argument('--posts-per-category', type=int, default=NUM_POSTS_PER_CATEGORY)
+    parser.add_argument('--comments-per-post', type=int, default=NUM_COMMENTS_PER_POST)
+    parser.add_argument('--batch-size', type=int, default=BULK_BATCH_SIZE)
+    parser.add_argument('--orm', action='store_true', help='insert through the ORM instead of bulk Core inserts')
+    args = parser.parse_args()
+    try:
+        init_db(num_posts=args.posts_per_category, num_comments=args.comments_per_post, bulk=not args.orm, batch_size=args.batch_size)
+    finally:
+        password_hasher.shutdown()
@@ -0,0 +1,197 @@
+# ratelimit_storage.py
+from limits.storage.base import MovingWindowSupport, SlidingWindowCounterSupport, Storage, TimestampedSlidingWindow
+from math import floor
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+
+
+class SQLiteStorage(Storage, MovingWindowSupport, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+    """Rate limit storage in a local SQLite file, shared by every process that opens it.
+
+    Use with ``storage_uri="sqlite:///relative/path.db"`` or
+    ``"sqlite:////absolute/path.db"``. Counters are updated with single atomic
+    statements, moving/sliding window checks run inside ``BEGIN IMMEDIATE``
+    transactions, and expired rows are purged every ``cleanup_interval`` seconds.
+    Written against the limits 5.x ``Storage`` interface (pinned in requirements.txt).
+    """
+
+    STORAGE_SCHEME = ['sqlite']
+
+    def __init__(self, uri=None, wrap_exceptions=False, cleanup_interval=60, busy_timeout=5000, **options):
+        parsed = urllib.parse.urlparse(uri or 'sqlite:///ratelimits.db')
+        self.path = parsed.path[1:] or 'ratelimits.db'
+        self.cleanup_interval = float(cleanup_interval)
+        self.busy_timeout = int(busy_timeout)
+        self._local = threading.local()
+        self._next_cleanup = 0.0
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self._create_schema()
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    @property
+    def _connection(self):
+        # Connections are per thread and per process (never reused across a fork)
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout / 1000, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(f'PRAGMA busy_timeout={self.busy_timeout}')
+            self._local.connection = connection
+            self._local.pid = pid
+        return self._local.connection
+
+    def _create_schema(self):
+        connection = self._connection
+        connection.execute('CREATE TABLE IF NOT EXISTS ratelimit_counters (key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires_at REAL NOT NULL)')
+        connection.execute('CREATE TABLE IF NOT EXISTS ratelimit_events (key TEXT NOT NULL, atime REAL NOT NULL, expires_at REAL NOT NULL)')
+        connection.execute('CREATE INDEX IF NOT EXISTS ix_ratelimit_events_key_atime ON ratelimit_events (key, atime)')
+        connection.execute('CREATE INDEX IF NOT EXISTS ix_ratelimit_events_expires_at ON ratelimit_events (expires_at)')
+
+    def _maybe_cleanup(self, now):
+        if now < self._next_cleanup:
+            return
+        self._next_cleanup = now + self.cleanup_interval
+        self.cleanup(now)
+
+    def cleanup(self, now=None):
+        """Delete expired counters and window entries; returns the number of rows removed."""
+        now = now or time.time()
+        connection = self._connection
+        removed = connection.execute('DELETE FROM ratelimit_counters WHERE expires_at <= ?', (now,)).rowcount
+        removed += connection.execute('DELETE FROM ratelimit_events WHERE expires_at <= ?', (now,)).rowcount
+        return removed
+
+    def incr(self, key, expiry, amount=1):
+        now = time.time()
+        self._maybe_cleanup(now)
+        row = self._connection.execute(
+            '''INSERT INTO ratelimit_counters (key, value, expires_at) VALUES (?, ?, ?)
+               ON CONFLICT(key) DO UPDATE SET
+                   value = CASE WHEN expires_at <= ? THEN excluded.value ELSE value + excluded.value END,
+                   expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END
+               RETURNING value''',
+            (key, amount, now + expiry, now, now)
+        ).fetchone()
+        return row[0]
+
+    def decr(self, key, amount=1):
+        row = self._connection.execute(
+            'UPDATE ratelimit_counters SET value = max(value - ?, 0) WHERE key = ? AND expires_at > ? RETURNING value',
+            (amount, key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get(self, key):
+        row = self._connection.execute(
+            'SELECT value FROM ratelimit_counters WHERE key = ? AND expires_at > ?', (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key):
+        now = time.time()
+        row = self._connection.execute(
+            'SELECT expires_at FROM ratelimit_counters WHERE key = ? AND expires_at > ?', (key, now)
+        ).fetchone()
+        return row[0] if row else now
+
+    def clear(self, key):
+        connection = self._connection
+        connection.execute('DELETE FROM ratelimit_counters WHERE key = ?', (key,))
+        connection.execute('DELETE FROM ratelimit_events WHERE key = ?', (key,))
+
+    def check(self):
+        try:
+            self._connection.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        connection = self._connection
+        removed = connection.execute('DELETE FROM ratelimit_counters').rowcount
+        removed += connection.execute('DELETE FROM ratelimit_events').rowcount
+        return removed
+
+    # Moving window
+
+    def acquire_entry(self, key, limit, expiry, amount=1):
+        if amount > limit:
+            return False
+        now = time.time()
+        self._maybe_cleanup(now)
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            (count,) = connection.execute(
+                'SELECT count(*) FROM ratelimit_events WHERE key = ? AND atime > ?', (key, now - expiry)
+            ).fetchone()
+            if count + amount > limit:
+                connection.execute('ROLLBACK')
+                return False
+            connection.executemany(
+                'INSERT INTO ratelimit_events (key, atime, expires_at) VALUES (?, ?, ?)',
+                [(key, now, now + expiry)] * amount
+            )
+            connection.execute('COMMIT')
+            return True
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+    def get_moving_window(self, key, limit, expiry):
+        now = time.time()
+        oldest, count = self._connection.execute(
+            'SELECT min(atime), count(*) FROM ratelimit_events WHERE key = ? AND atime > ?', (key, now - expiry)
+        ).fetchone()
+        return (oldest, count) if count else (now, 0)
+
+    # Sliding window counter
+
+    def _get_sliding_window_info(self, previous_key, current_key, expiry, now):
+        previous_count = self.get(previous_key)
+        current_count = self.get(current_key)
+        if previous_count == 0:
+            previous_ttl = 0.0
+        else:
+            previous_ttl = (1 - (((now - expiry) / expiry) % 1)) * expiry
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_count, previous_ttl, current_count, current_ttl
+
+    def acquire_sliding_window_entry(self, key, limit, expiry, amount=1):
+        if amount > limit:
+            return False
+        now = time.time()
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            previous_count, previous_ttl, current_count, _ = self._get_sliding_window_info(previous_key, current_key, expiry, now)
+            if floor(previous_count * previous_ttl / expiry + current_count) + amount > limit:
+                connection.execute('ROLLBACK')
+                return False
+            # New window counters live for two windows so they can serve as "previous"
+            self.incr(current_key, 2 * expiry, amount=amount)
+            connection.execute('COMMIT')
+            return True
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+    def get_sliding_window(self, key, expiry):
+        now = time.time()
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        return self._get_sliding_window_info(previous_key, current_key, expiry, now)
+
+    def clear_sliding_window(self, key, expiry):
+        previous_key, current_key = self.sliding_window_keys(key, expiry, time.time())
+        self.clear(previous_key)
+        self.clear(current_key)
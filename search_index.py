@@ -0,0 +1,136 @@
+# search_index.py
+from sqlalchemy import bindparam, event, func, or_, text
+from models import db, Post, Timestamp
+import re
+
+# The search index shares rowids with the post table, so triggers can update or
+# delete an entry by rowid instead of scanning the index.
+SEARCH_POST_TYPES = ['announcements', 'marketplace', 'services']
+SEARCH_RESULT_CAP = 500
+SEARCH_TRIGGERS = ['post_search_insert', 'post_search_delete', 'post_search_update']
+SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS post_search USING fts5(title, body, post_type, prefix='2 3')",
+    """CREATE TRIGGER IF NOT EXISTS post_search_insert AFTER INSERT ON post BEGIN
+        INSERT INTO post_search(rowid, title, body, post_type) VALUES (new.id, new.title, new.body, new.post_type);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS post_search_delete AFTER DELETE ON post BEGIN
+        DELETE FROM post_search WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS post_search_update AFTER UPDATE OF title, body, post_type ON post BEGIN
+        UPDATE post_search SET title = new.title, body = new.body, post_type = new.post_type WHERE rowid = old.id;
+    END"""
+]
+
+
+def search_index_supported(connection):
+    return connection.dialect.name == 'sqlite'
+
+
+def create_search_index(connection):
+    """Create the FTS5 table and its sync triggers if they do not exist yet."""
+    if not search_index_supported(connection):
+        return
+    for statement in SEARCH_DDL:
+        connection.exec_driver_sql(statement)
+
+
+def drop_search_index(connection):
+    """Drop the FTS5 table and its triggers; `create_search_index` restores both."""
+    if not search_index_supported(connection):
+        return
+    for trigger in SEARCH_TRIGGERS:
+        connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+    connection.exec_driver_sql("DROP TABLE IF EXISTS post_search")
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _after_create(metadata, connection, **kw):
+    create_search_index(connection)
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _before_drop(metadata, connection, **kw):
+    drop_search_index(connection)
+
+
+def rebuild_search_index():
+    """Backfill the search index from the post table, replacing its contents."""
+    connection = db.session.connection()
+    if not search_index_supported(connection):
+        return 0
+    create_search_index(connection)
+    connection.exec_driver_sql("DELETE FROM post_search")
+    connection.exec_driver_sql("INSERT INTO post_search(rowid, title, body, post_type) SELECT id, title, body, post_type FROM post")
+    total = connection.exec_driver_sql("SELECT count(*) FROM post_search").scalar()
+    db.session.commit()
+    return total
+
+
+def build_match_expression(query, post_type=''):
+    """Turn free text into an FTS5 MATCH expression of prefix terms, or None to match everything."""
+    terms = [f'"{term}"*' for term in re.findall(r'\w+', query)]
+    clauses = []
+    if post_type in SEARCH_POST_TYPES:
+        clauses.append(f'post_type : {post_type}')
+    if terms:
+        clauses.append('{title body} : (' + ' AND '.join(terms) + ')')
+    return ' AND '.join(clauses) or None
+
+
+def search_posts(query, post_type='', page=1, per_page=20, since=None, until=None):
+    """Ranked search over all post types, optionally limited to posts dated in [since, until).
+
+    Returns ([post_id, ...] for the requested page, total) where total is
+    capped at SEARCH_RESULT_CAP. Databases without FTS5 fall back to
+    substring matching, newest first, as do date-filtered listings with no
+    search terms (those are served by the date index instead).
+    """
+    if query.strip() and not re.search(r'\w', query):
+        return [], 0
+    offset = (page - 1) * per_page
+    limit = max(0, min(per_page, SEARCH_RESULT_CAP - offset))
+    match = build_match_expression(query, post_type)
+    dated = since is not None or until is not None
+    if not search_index_supported(db.engine) or (match is None and dated):
+        return _search_posts_like(query, post_type, limit, offset, since, until)
+    source, clauses, params = 'post_search', [], {}
+    if match is not None:
+        clauses.append('post_search MATCH :match')
+        params['match'] = match
+    if dated:
+        source = 'post_search JOIN post ON post.id = post_search.rowid'
+        if since is not None:
+            clauses.append('post.date >= :since')
+            params['since'] = since
+        if until is not None:
+            clauses.append('post.date < :until')
+            params['until'] = until
+    where = 'WHERE ' + ' AND '.join(clauses) if clauses else ''
+    order = 'rank' if match is not None else 'post_search.rowid DESC'
+    dates = [bindparam(name, type_=Timestamp) for name in ('since', 'until') if name in params]
+    total = db.session.execute(
+        text(f"SELECT count(*) FROM (SELECT post_search.rowid FROM {source} {where} LIMIT :cap)").bindparams(*dates),
+        dict(params, cap=SEARCH_RESULT_CAP)
+    ).scalar()
+    rows = db.session.execute(
+        text(f"SELECT post_search.rowid FROM {source} {where} ORDER BY {order} LIMIT :limit OFFSET :offset").bindparams(*dates),
+        dict(params, limit=limit, offset=offset)
+    ).all()
+    return [rowid for (rowid,) in rows], total
+
+
+def _search_posts_like(query, post_type, limit, offset, since=None, until=None):
+    """Portable search: every term must appear in the title or body, case-insensitively."""
+    matches = db.session.query(Post.id)
+    if post_type in SEARCH_POST_TYPES:
+        matches = matches.filter(Post.post_type == post_type)
+    if since is not None:
+        matches = matches.filter(Post.date >= since)
+    if until is not None:
+        matches = matches.filter(Post.date < until)
+    for term in re.findall(r'\w+', query):
+        pattern = '%' + term.replace('_', '\\_') + '%'
+        matches = matches.filter(or_(Post.title.ilike(pattern, escape='\\'), Post.body.ilike(pattern, escape='\\')))
+    total = db.session.query(func.count()).select_from(matches.limit(SEARCH_RESULT_CAP).subquery()).scalar()
+    rows = matches.order_by(Post.date.desc(), Post.id.desc()).limit(limit).offset(offset).all()
+    return [post_id for (post_id,) in rows], total
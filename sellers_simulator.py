@@ -1,8 +1,15 @@
 # sellers_simulator.py
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from models import db, User, Marketplace
-from datetime import datetime, timedelta
+from db_config import configure_database
+from models import db, User, Announcement, Marketplace, Service, Comment, POST_MODELS
+from seed_data import (
+    ANNOUNCEMENT_CATEGORIES, SERVICE_CATEGORIES, random_timestamp,
+    announcement_rows, marketplace_rows, service_rows, comment_rows
+)
+from collections import Counter
+import argparse
+import math
 import random
 import logging
 import time
@@ -20,9 +27,7 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///database.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
+configure_database(app)
 
 # Post templates
 positive_list = [
@@ -89,14 +94,6 @@ neutral_replacements = {
 }
 
 
-def random_timestamp():
-    days_ago = random.randint(0, 30)
-    hours_ago = random.randint(0, 23)
-    minutes_ago = random.randint(0, 59)
-    seconds_ago = random.randint(0, 59)
-    return (datetime.now() - timedelta(days=days_ago, hours=hours_ago, minutes=minutes_ago, seconds=seconds_ago)).strftime('%Y-%m-%d %H:%M:%S')
-
-
 def paraphrase_post(template, replacements):
     """Paraphrase a post by replacing placeholders or modifying structure."""
     try:
@@ -120,61 +117,204 @@ def paraphrase_post(template, replacements):
         logger.error(f"Error paraphrasing post: {str(e)}")
         return "Error Post", "Generated post error", "DM for price"
 
-def add_sellers_post(post_type):
-    """Add a single post to the Sellers marketplace."""
-    with app.app_context():
-        user_ids = [user.id for user in User.query.all()]
-        if not user_ids:
-            logger.error("No users found in database")
-            return False
-
-        # Select template based on post type
-        if post_type == "positive":
-            template = random.choice(positive_list)
-            replacements = positive_replacements
-        elif post_type == "negative":
-            template = random.choice(negative_list)
-            replacements = negative_replacements
-        else:  # neutral
-            template = random.choice(neutral_list)
-            replacements = neutral_replacements
-
-        title, description, price = paraphrase_post(template, replacements)
-        post = Marketplace(
-            category="Sellers",
-            title=title[:100],
-            description=description[:200],
-            user_id=random.choice(user_ids),
-            price=price[:20],
-            date=random_timestamp()
-        )
+
+# Sentiment mix of Sellers posts (4 neutral : 4 negative : 2 positive)
+SELLER_SENTIMENTS = {
+    'neutral': (4, neutral_list, neutral_replacements),
+    'negative': (4, negative_list, negative_replacements),
+    'positive': (2, positive_list, positive_replacements)
+}
+
+
+def sellers_rows(count, user_ids, post_ids):
+    sentiments = list(SELLER_SENTIMENTS)
+    weights = [SELLER_SENTIMENTS[s][0] for s in sentiments]
+    for sentiment in random.choices(sentiments, weights=weights, k=count):
+        _, templates, replacements = SELLER_SENTIMENTS[sentiment]
+        title, description, price = paraphrase_post(random.choice(templates), replacements)
+        yield {
+            'category': 'Sellers',
+            'title': title[:100],
+            'body': description[:200],
+            'user_id': random.choice(user_ids),
+            'price': price[:20],
+            'date': random_timestamp()
+        }
+
+
+def buyers_rows(count, user_ids, post_ids):
+    return marketplace_rows('Buyers', count, user_ids)
+
+
+def announcements_rows(count, user_ids, post_ids):
+    for category, n in Counter(random.choices(ANNOUNCEMENT_CATEGORIES, k=count)).items():
+        yield from announcement_rows(category, n, user_ids)
+
+
+def services_rows(count, user_ids, post_ids):
+    for category, n in Counter(random.choices(SERVICE_CATEGORIES, k=count)).items():
+        yield from service_rows(category, n, user_ids)
+
+
+def comments_rows(count, user_ids, post_ids):
+    if not post_ids:
+        return iter(())
+    return comment_rows(random.choices(post_ids, k=count), 1, user_ids)
+
+
+# Stream name -> (model, row generator(count, user_ids, post_ids))
+STREAMS = {
+    'sellers': (Marketplace, sellers_rows),
+    'buyers': (Marketplace, buyers_rows),
+    'announcements': (Announcement, announcements_rows),
+    'services': (Service, services_rows),
+    'comments': (Comment, comments_rows)
+}
+
+
+# Rate profiles: (elapsed seconds, period, factor) -> multiplier applied to the base rate
+def steady_profile(elapsed, period, factor):
+    return 1.0
+
+
+def burst_profile(elapsed, period, factor):
+    # factor x the base rate for the first tenth of every period
+    return factor if elapsed % period < period / 10 else 1.0
+
+
+def wave_profile(elapsed, period, factor):
+    # Smoothly oscillates between 1x and factor x the base rate, like a daily traffic curve
+    return 1 + (factor - 1) * (1 - math.cos(2 * math.pi * elapsed / period)) / 2
+
+
+PROFILES = {
+    'steady': steady_profile,
+    'burst': burst_profile,
+    'wave': wave_profile
+}
+
+
+def parse_mix(text):
+    """Parse 'sellers=5,comments=2' into {'sellers': 5.0, 'comments': 2.0}."""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in STREAMS:
+            raise ValueError(f"Unknown stream '{name}', expected one of {', '.join(STREAMS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class SimulatorEngine:
+    """Inserts generated forum content at a target rate, in batched transactions.
+
+    `rate` is the average number of rows per second, shaped over time by a
+    profile and split across streams by `mix` weights. User ids and recent post
+    ids (the targets for comments) are cached and refreshed every
+    `refresh_interval` seconds rather than re-queried per row.
+    """
+
+    def __init__(self, rate=10 / 60, mix=None, profile='steady', period=600, burst_factor=5.0,
+                 batch_size=100, refresh_interval=60, recent_posts=1000):
+        self.rate = rate
+        self.mix = mix or {'sellers': 1.0}
+        self.profile = PROFILES[profile]
+        self.period = period
+        self.burst_factor = burst_factor
+        self.batch_size = batch_size
+        self.refresh_interval = refresh_interval
+        self.recent_posts = recent_posts
+        self.user_ids = []
+        self.post_ids = []
+        self.inserted = Counter()
+        self.errors = 0
+
+    def refresh_ids(self):
+        self.user_ids = [user_id for (user_id,) in db.session.query(User.id)]
+        self.post_ids = []
+        for model in POST_MODELS.values():
+            ids = db.session.query(model.id).order_by(model.id.desc()).limit(self.recent_posts)
+            self.post_ids.extend(post_id for (post_id,) in ids)
+        db.session.commit()
+
+    def insert_batch(self, count):
+        """Insert `count` rows split across the streams in one transaction."""
+        names = list(self.mix)
+        allocation = Counter(random.choices(names, weights=[self.mix[n] for n in names], k=count))
+        posts, comments = [], []
+        for name, n in allocation.items():
+            model, generate = STREAMS[name]
+            target = comments if model is Comment else posts
+            target.extend((name, model(**row)) for row in generate(n, self.user_ids, self.post_ids))
         try:
-            db.session.add(post)
+            db.session.add_all(obj for _, obj in posts + comments)
             db.session.commit()
-            logger.info(f"Added {post_type} Sellers post: {title[:30]}... by user {post.user_id}")
-            return True
         except Exception as e:
-            logger.error(f"Error committing {post_type} Sellers post: {str(e)}")
+            logger.error(f"Error committing batch of {count} rows: {str(e)}")
             db.session.rollback()
-            return False
+            self.errors += 1
+            return 0
+        for name, obj in posts + comments:
+            self.inserted[name] += 1
+        # New posts become comment targets straight away
+        self.post_ids.extend(obj.id for _, obj in posts)
+        return len(posts) + len(comments)
+
+    def run(self, duration=None, report_interval=60):
+        with app.app_context():
+            self.refresh_ids()
+            if not self.user_ids:
+                logger.error("No users found in database")
+                return self.inserted
+            start = last = last_refresh = last_report = time.monotonic()
+            credit = 0.0
+            while duration is None or last - start < duration:
+                now = time.monotonic()
+                current_rate = self.rate * self.profile(now - start, self.period, self.burst_factor)
+                credit += current_rate * (now - last)
+                last = now
+                if now - last_refresh >= self.refresh_interval:
+                    self.refresh_ids()
+                    last_refresh = now
+                due = int(credit)
+                while due > 0:
+                    count = min(due, self.batch_size)
+                    self.insert_batch(count)
+                    credit -= count
+                    due -= count
+                if now - last_report >= report_interval:
+                    total = sum(self.inserted.values())
+                    logger.info(f"Inserted {total} rows ({total / (now - start):.2f}/s, target {current_rate:.2f}/s): {dict(self.inserted)}")
+                    last_report = now
+                # Sleep until the next row is due, but wake at least once a second
+                wait = (1 - credit) / current_rate if current_rate > 0 else 1.0
+                time.sleep(min(max(wait, 0.001), 1.0))
+        return self.inserted
+
 
 def main():
-    logger.info("Starting Sellers simulator")
+    parser = argparse.ArgumentParser(description='Continuously generate forum content at a target rate.')
+    parser.add_argument('--rate', type=float, default=10 / 60, help='average rows per second (default: 10 per minute)')
+    parser.add_argument('--mix', default='sellers=1', help=f"stream weights, e.g. sellers=4,comments=2 (streams: {', '.join(STREAMS)})")
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='steady')
+    parser.add_argument('--period', type=float, default=600, help='profile period in seconds')
+    parser.add_argument('--burst-factor', type=float, default=5.0, help='peak rate multiplier for burst/wave profiles')
+    parser.add_argument('--batch-size', type=int, default=100, help='max rows per transaction')
+    parser.add_argument('--refresh', type=float, default=60, help='seconds between user/post id cache refreshes')
+    parser.add_argument('--duration', type=float, default=None, help='stop after this many seconds')
+    args = parser.parse_args()
+
+    engine = SimulatorEngine(rate=args.rate, mix=parse_mix(args.mix), profile=args.profile, period=args.period,
+                             burst_factor=args.burst_factor, batch_size=args.batch_size, refresh_interval=args.refresh)
+    logger.info(f"Starting simulator: {args.rate:.3f} rows/s, mix {args.mix}, {args.profile} profile")
     try:
-        while True:
-            # Add 10 posts: 4 neutral, 4 negative, 2 positive
-            for _ in range(4):
-                add_sellers_post("neutral")
-            for _ in range(4):
-                add_sellers_post("negative")
-            for _ in range(2):
-                add_sellers_post("positive")
-            logger.info("Added batch of 10 Sellers posts, waiting 60 seconds")
-            time.sleep(60)
+        engine.run(duration=args.duration)
     except KeyboardInterrupt:
-        logger.info("Sellers simulator stopped by user")
+        logger.info("Simulator stopped by user")
     except Exception as e:
         logger.error(f"Simulator crashed: {str(e)}")
+    logger.info(f"Inserted {sum(engine.inserted.values())} rows: {dict(engine.inserted)}")
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,134 @@
+# tests/conftest.py
+"""Shared fixtures: the app on a throwaway SQLite database seeded with a small forum.
+
+The environment is set before app.py is imported, because it reads its
+configuration at import time. Tests that take `database_url` run once on
+SQLite and once on PostgreSQL when POSTGRES_URL points at a server; each run
+gets a schema of its own there, dropped afterwards.
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import os
+import secrets
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+DATABASE_DIR = tempfile.mkdtemp()
+os.environ.update({
+    'DATABASE_URL': 'sqlite:///' + os.path.join(DATABASE_DIR, 'forum.db'),
+    'RATELIMIT_ENABLED': '0',
+    'RATELIMIT_STORAGE_URI': 'memory://',
+    'BCRYPT_LOG_ROUNDS': '4',
+    'PASSWORD_HASH_WORKERS': '1',
+    'INSTRUMENTATION': '0',
+})
+
+import pytest
+from sqlalchemy import create_engine, event
+
+import app as forum
+from models import db, User, Post, Comment, rebuild_category_stats, rebuild_user_stats
+
+START = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def seed_forum():
+    """A forum shaped so the same page can be compared with few and many rows on it.
+
+    - marketplace/Sellers: one post by `newcomer`, no comments
+    - marketplace/Buyers: ten posts by ten authors, three comments each
+    - `regular`: 25 posts across announcements and services, and every Buyers comment
+    """
+    users = {name: User(username=name, password='x', avatar='default.jpg')
+             for name in ['newcomer', 'regular'] + [f'author{i}' for i in range(10)]}
+    db.session.add_all(users.values())
+    db.session.flush()
+    tick = iter(range(10000))
+
+    def post(post_type, category, author):
+        row = Post(post_type=post_type, category=category, title=f'{category} post', body='body', price='10',
+                   user_id=users[author].id, date=START + timedelta(minutes=next(tick)))
+        db.session.add(row)
+        return row
+
+    post('marketplace', 'Sellers', 'newcomer')
+    buyers = [post('marketplace', 'Buyers', f'author{i}') for i in range(10)]
+    for i in range(25):
+        post(*(('announcements', 'General') if i % 2 else ('services', 'Sell')), 'regular')
+    db.session.flush()
+    for i, row in enumerate(buyers):
+        for author in ('regular', f'author{i}', 'regular'):
+            db.session.add(Comment(post_id=row.id, user_id=users[author].id, content='comment',
+                                   date=START + timedelta(minutes=next(tick))))
+    db.session.commit()
+    rebuild_category_stats()
+    rebuild_user_stats()
+
+
+@pytest.fixture(scope='session')
+def app():
+    with forum.app.app_context():
+        db.create_all()
+        seed_forum()
+    yield forum.app
+    forum.password_hasher.shutdown()
+
+
+@pytest.fixture(params=['sqlite', 'postgresql'])
+def database_url(request, tmp_path):
+    """URL of an empty database on each backend."""
+    if request.param == 'sqlite':
+        yield f"sqlite:///{tmp_path / 'forum.db'}"
+        return
+    url = os.environ.get('POSTGRES_URL')
+    if not url:
+        pytest.skip('set POSTGRES_URL to run against PostgreSQL')
+    pytest.importorskip('psycopg')
+    schema = f"test_{secrets.token_hex(4)}"
+    admin = create_engine(url)
+    with admin.begin() as connection:
+        connection.exec_driver_sql(f"CREATE SCHEMA {schema}")
+    try:
+        yield f"{url}{'&' if '?' in url else '?'}options=-csearch_path%3D{schema}"
+    finally:
+        with admin.begin() as connection:
+            connection.exec_driver_sql(f"DROP SCHEMA {schema} CASCADE")
+        admin.dispose()
+
+
+@pytest.fixture
+def client(app):
+    """A test client logged in as `regular`, with the page and user caches emptied."""
+    forum.fragment_cache.clear()
+    forum.user_cache.clear()
+    client = app.test_client()
+    with app.app_context():
+        user_id = db.session.execute(db.select(User.id).filter_by(username='regular')).scalar_one()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+@pytest.fixture
+def count_statements(app):
+    """Context manager that collects every (statement, parameters) the database runs inside it."""
+    with app.app_context():
+        engine = db.engine
+
+    @contextmanager
+    def counting():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+
+    return counting
@@ -0,0 +1,49 @@
+# tests/test_captcha.py
+"""The CAPTCHA answer stays on the server and each challenge can be answered once."""
+import json
+
+from models import db, CaptchaChallenge
+
+
+def issue_challenge(app, client):
+    """Fetch the login form and return (challenge id, answer) for the CAPTCHA it issued."""
+    assert client.get('/login').status_code == 200
+    with client.session_transaction() as session:
+        challenge_id = session['captcha_id']
+        cookie = json.dumps(dict(session))
+    with app.app_context():
+        code = db.session.get(CaptchaChallenge, challenge_id).code
+    assert code not in cookie
+    return challenge_id, code
+
+
+def submit(client, captcha):
+    return client.post('/login', data={'username': 'nobody', 'password': 'x', 'captcha': captcha}).get_data(as_text=True)
+
+
+def test_answer_is_kept_server_side(app):
+    client = app.test_client()
+    challenge_id, code = issue_challenge(app, client)
+    assert client.get('/captcha.png').status_code == 200
+    # A right answer gets as far as the password check
+    assert 'Invalid username or password' in submit(client, code.lower())
+    with app.app_context():
+        assert db.session.get(CaptchaChallenge, challenge_id) is None
+
+
+def test_challenge_is_used_up_by_a_wrong_answer(app):
+    client = app.test_client()
+    challenge_id, code = issue_challenge(app, client)
+    assert 'Invalid CAPTCHA' in submit(client, 'WRONG!')
+    with client.session_transaction() as session:
+        session['captcha_id'] = challenge_id
+    assert 'Invalid CAPTCHA' in submit(client, code)
+
+
+def test_answer_cannot_be_replayed(app):
+    client = app.test_client()
+    challenge_id, code = issue_challenge(app, client)
+    assert 'Invalid username or password' in submit(client, code)
+    with client.session_transaction() as session:
+        session['captcha_id'] = challenge_id
+    assert 'Invalid CAPTCHA' in submit(client, code)
@@ -0,0 +1,65 @@
+# tests/test_concurrency.py
+"""Page reads keep working while the simulator writes to the same database from another process.
+
+Both sides go through db_config (WAL, busy_timeout), so neither should see
+"database is locked". benchmarks/concurrency_check.py runs the same check at
+scale and reports latencies.
+"""
+import os
+import subprocess
+import sys
+import threading
+
+from flask import got_request_exception
+
+import app as forum
+from models import db, User, Post, Comment
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+URLS = ['/category/marketplace/Buyers', '/category/services/Sell?page=2', '/profile/regular', '/search?query=post']
+
+
+def count_rows():
+    return db.session.scalar(db.select(db.func.count(Post.id))) + db.session.scalar(db.select(db.func.count(Comment.id)))
+
+
+def test_reads_do_not_fail_while_the_simulator_writes(app, monkeypatch, tmp_path):
+    # Every read renders from the database instead of the page cache
+    monkeypatch.setattr(forum.fragment_cache, 'maxsize', 0)
+    with app.app_context():
+        user_id = db.session.execute(db.select(User.id).filter_by(username='regular')).scalar_one()
+        post_id = db.session.scalar(db.select(Post.id).filter_by(category='Buyers'))
+        before = count_rows()
+    urls = URLS + [f'/post/marketplace/{post_id}']
+    errors, statuses = [], []
+
+    def record_error(sender, exception, **extra):
+        errors.append(str(exception))
+
+    simulator = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'sellers_simulator.py'), '--rate', '200', '--duration', '2',
+         '--mix', 'sellers=2,buyers=1,comments=3', '--batch-size', '10', '--refresh', '1'],
+        cwd=tmp_path, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+    )
+
+    def reader():
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        while simulator.poll() is None:
+            for url in urls:
+                statuses.append(client.get(url).status_code)
+
+    with got_request_exception.connected_to(record_error, app):
+        readers = [threading.Thread(target=reader) for _ in range(4)]
+        for thread in readers:
+            thread.start()
+        log = simulator.communicate(timeout=60)[0]
+        for thread in readers:
+            thread.join()
+
+    with app.app_context():
+        assert count_rows() > before
+    assert statuses and all(status == 200 for status in statuses), errors
+    assert 'database is locked' not in log and 'Error committing' not in log, log
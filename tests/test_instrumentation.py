@@ -0,0 +1,22 @@
+# tests/test_instrumentation.py
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from instrumentation import Instrumentation
+
+
+def test_a_failing_statement_does_not_leave_its_start_time_behind(tmp_path):
+    app = Flask('instrumented')
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{tmp_path / "metrics.db"}'
+    db = SQLAlchemy(app)
+    Instrumentation(enabled=True).init_app(app, db)
+    with app.app_context():
+        with db.engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.execute(text('SELECT * FROM missing_table'))
+            assert not conn.info.get('_instrumentation_start')
+            conn.execute(text('SELECT 1'))
+            assert not conn.info.get('_instrumentation_start')
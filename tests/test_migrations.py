@@ -0,0 +1,117 @@
+# tests/test_migrations.py
+"""Upgrading a database from before the post tables were unified."""
+from datetime import datetime
+
+from flask import Flask
+import pytest
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, MetaData, String, Table, Text, inspect
+
+from db_config import configure_database
+import migrations
+from models import db, Post, Comment
+
+# The per-type tables as the original models created them
+LEGACY_TABLES = MetaData()
+Table('user', LEGACY_TABLES, Column('id', Integer, primary_key=True), Column('username', String(50), nullable=False, unique=True),
+      Column('password', String(128), nullable=False), Column('avatar', String(200)))
+for name, body, has_price in [('announcement', 'content', False), ('marketplace', 'description', True), ('service', 'description', True)]:
+    Table(name, LEGACY_TABLES, Column('id', Integer, primary_key=True), Column('category', String(20)), Column('title', String(100)),
+          Column(body, Text), Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+          *([Column('price', String(20))] if has_price else []), Column('date', String(20)))
+Table('comment', LEGACY_TABLES, Column('id', Integer, primary_key=True), Column('post_type', String(20)), Column('post_id', Integer),
+      Column('user_id', Integer, ForeignKey('user.id'), nullable=False), Column('content', Text), Column('date', String(20)))
+LEGACY_ROWS = [
+    "INSERT INTO \"user\" VALUES (1, 'alice', 'x', NULL), (2, 'bob', 'x', NULL)",
+    "INSERT INTO announcement VALUES (1, 'General', 'hello', 'text', 1, '2024-01-01 10:00:00')",
+    "INSERT INTO marketplace VALUES (1, 'Sellers', 'vpn', 'text', 2, '10', '2024-01-02 10:00:00'), "
+    "(2, 'Buyers', 'rdp', 'text', 1, '20', '2024-01-03 10:00:00')",
+    "INSERT INTO service VALUES (1, 'Sell', 'panel', 'text', 2, '30', '2024-01-04 10:00:00')",
+    "INSERT INTO comment VALUES (1, 'marketplace', 1, 1, 'a', '2024-01-05 10:00:00'), "
+    "(2, 'announcement', 1, 2, 'b', '2024-01-06 10:00:00'), (3, 'service', 1, 1, 'c', '2024-01-07 10:00:00')",
+]
+
+
+@pytest.fixture
+def database(database_url, tmp_path):
+    """An app context on an empty database, on each backend."""
+    app = Flask('legacy', instance_path=str(tmp_path))
+    configure_database(app, database_url)
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def legacy_app(database):
+    LEGACY_TABLES.create_all(db.engine)
+    with db.engine.begin() as connection:
+        for statement in LEGACY_ROWS:
+            connection.exec_driver_sql(statement)
+    return database
+
+
+def scalar(sql):
+    return db.session.connection().exec_driver_sql(sql).scalar()
+
+
+def test_upgrade_moves_posts_and_fills_the_counters(legacy_app):
+    migrations.upgrade_db()
+    assert not inspect(db.engine).has_table('marketplace')
+    assert scalar("SELECT count(*) FROM post") == 4
+    assert scalar("SELECT sum(count) FROM category_stats") == 4
+    assert scalar("SELECT sum(announcements + marketplace + services) FROM user_stats") == 4
+    assert scalar("SELECT sum(comments) FROM user_stats") == 3
+    if db.engine.dialect.name == 'sqlite':
+        assert scalar("SELECT count(*) FROM post_search") == 4
+    assert db.session.get(Comment, 1).date == datetime(2024, 1, 5, 10, 0)
+    # Running it again changes nothing
+    migrations.upgrade_db()
+    assert scalar("SELECT sum(count) FROM category_stats") == 4
+
+
+def test_failed_upgrade_leaves_the_legacy_tables(legacy_app, monkeypatch):
+    def crash(session=None):
+        raise RuntimeError('crash')
+
+    monkeypatch.setattr(migrations, 'rebuild_user_stats', crash)
+    with pytest.raises(RuntimeError):
+        migrations.upgrade_db()
+    tables = set(inspect(db.engine).get_table_names())
+    assert {'announcement', 'marketplace', 'service', 'comment'} <= tables
+    assert not tables & {'post', 'category_stats', 'comment_legacy'}
+    assert scalar("SELECT count(*) FROM comment") == 3
+    monkeypatch.undo()
+    migrations.upgrade_db()
+    assert scalar("SELECT sum(count) FROM category_stats") == 4
+
+
+def test_empty_counters_are_refilled(legacy_app):
+    migrations.upgrade_db()
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql("DELETE FROM category_stats")
+        connection.exec_driver_sql("DELETE FROM user_stats")
+    migrations.upgrade_db()
+    assert scalar("SELECT sum(count) FROM category_stats") == 4
+    assert scalar("SELECT sum(comments) FROM user_stats") == 3
+
+
+def test_string_dates_become_timestamps(database):
+    # A unified database from before the date columns were DateTime
+    tables = MetaData()
+    db.metadata.tables['user'].to_metadata(tables)
+    for model in (Post, Comment):
+        model.__table__.to_metadata(tables).c.date.type = String(20)
+    tables.create_all(db.engine)
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO \"user\" (id, username, password) VALUES (1, 'alice', 'x')")
+        connection.exec_driver_sql("INSERT INTO post (id, post_type, category, title, body, user_id, date) "
+                                   "VALUES (1, 'services', 'Sell', 'panel', 'text', 1, '2024-01-02T10:00:00.250')")
+        connection.exec_driver_sql("INSERT INTO comment (id, post_id, user_id, content, date) VALUES (1, 1, 1, 'a', '2024-01-03 10:00:00')")
+    migrations.upgrade_db()
+    if db.engine.dialect.name == 'postgresql':
+        columns = {c['name']: c['type'] for c in inspect(db.engine).get_columns('post')}
+        assert isinstance(columns['date'], DateTime)
+    assert db.session.get(Post, 1).date == datetime(2024, 1, 2, 10, 0)
+    assert db.session.get(Comment, 1).date == datetime(2024, 1, 3, 10, 0)
+    assert Post.query.filter(Post.date >= datetime(2024, 1, 2)).count() == 1
@@ -0,0 +1,73 @@
+# tests/test_page_cache.py
+"""Post pages revalidate against their own post, comments and author, not their whole category."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from werkzeug.http import http_date
+
+from models import db, User, Post, Comment
+
+
+@pytest.fixture
+def post(app):
+    """A services/Sell post by `regular`, and its page URL."""
+    with app.app_context():
+        post = Post.query.filter_by(post_type='services', category='Sell').order_by(Post.id).first()
+        return post.id, post.user_id, f'/post/services/{post.id}'
+
+
+def add(app, model, **values):
+    with app.app_context():
+        if 'user_id' not in values:
+            values['user_id'] = db.session.execute(db.select(User.id).filter_by(username='author0')).scalar_one()
+        db.session.add(model(date=datetime(2024, 6, 1), **values))
+        db.session.commit()
+
+
+def test_other_posts_in_the_category_keep_the_page_current(app, client, post):
+    _, _, url = post
+    etag = client.get(url).headers['ETag']
+    add(app, Post, post_type='services', category='Sell', title='another', body='body')
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_a_comment_on_the_post_changes_its_page(app, client, post):
+    post_id, _, url = post
+    etag = client.get(url).headers['ETag']
+    add(app, Comment, post_id=post_id, content='new comment')
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert 'new comment' in response.get_data(as_text=True)
+
+
+def test_the_authors_counters_change_the_page(app, client, post):
+    _, author_id, url = post
+    etag = client.get(url).headers['ETag']
+    add(app, Post, post_type='announcements', category='General', title='by the author', body='body', user_id=author_id)
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_if_modified_since_does_not_hide_a_write_in_the_same_second(app, client, post):
+    post_id, _, url = post
+    last_modified = client.get(url).headers['Last-Modified']
+    add(app, Comment, post_id=post_id, content='same second')
+    response = client.get(url, headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 200
+    assert 'same second' in response.get_data(as_text=True)
+    later = http_date(datetime.now(timezone.utc) + timedelta(minutes=1))
+    assert client.get(url, headers={'If-Modified-Since': later}).status_code == 304
+
+
+def test_a_deleted_post_is_not_served_from_the_cache(app, client):
+    with app.app_context():
+        post = Post(post_type='services', category='Sell', title='short-lived', body='body', date=datetime(2024, 6, 1),
+                    user_id=db.session.execute(db.select(User.id).filter_by(username='author0')).scalar_one())
+        db.session.add(post)
+        db.session.commit()
+        post_id = post.id
+    url = f'/post/services/{post_id}'
+    assert 'short-lived' in client.get(url).get_data(as_text=True)
+    with app.app_context():
+        db.session.delete(db.session.get(Post, post_id))
+        db.session.commit()
+    assert client.get(url).status_code == 404
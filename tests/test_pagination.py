@@ -0,0 +1,81 @@
+# tests/test_pagination.py
+import html
+import re
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from models import db, Comment, Post, User
+from pagination import encode_cursor, keyset_paginate, parse_date_param
+
+
+def buyers_page(**cursor):
+    query = Post.query.filter_by(post_type='marketplace', category='Buyers')
+    return keyset_paginate(query, Post, per_page=3, **cursor)
+
+
+@pytest.mark.parametrize('cursor', [{'after': ''}, {'after': 'not-a-cursor'}, {'before': 'not-a-cursor'}, {'before': 'bnVsbA'}])
+def test_missing_or_undecodable_cursor_returns_first_page(app, cursor):
+    with app.app_context():
+        first = buyers_page(after=None)
+        page = buyers_page(**cursor)
+        assert [post.id for post in page.items] == [post.id for post in first.items]
+        assert page.prev_cursor is None
+        assert page.next_cursor == first.next_cursor
+
+
+def test_before_cursor_returns_previous_page(app):
+    with app.app_context():
+        first = buyers_page(after='')
+        second = buyers_page(after=first.next_cursor)
+        back = buyers_page(before=second.prev_cursor)
+        assert [post.id for post in back.items] == [post.id for post in first.items]
+        assert second.prev_cursor == encode_cursor(second.items[0])
+
+
+@pytest.mark.parametrize('value', ['99999999d', '9999999999999999999999d', '99999999999w'])
+def test_out_of_range_age_is_ignored(value):
+    assert parse_date_param(value) is None
+
+
+def test_until_on_the_last_representable_day_is_ignored():
+    assert parse_date_param('9999-12-31', end=True) is None
+
+
+@pytest.mark.parametrize('url', [
+    '/category/marketplace/Buyers?since=99999999d',
+    '/search?q=post&until=9999999999999999999999d',
+    '/api/v1/categories/marketplace/Buyers?since=99999999d&until=9999-12-31',
+])
+def test_out_of_range_dates_do_not_fail_the_request(client, url):
+    assert client.get(url).status_code == 200
+
+
+def pager_links(client, url):
+    """Query args of each pager link in the page at `url`, keyed by pager label."""
+    page = client.get(url).get_data(as_text=True)
+    links = {}
+    for nav, body in re.findall(r'<nav aria-label="(\w+) pagination">(.*?)</nav>', page, re.S):
+        for href, text in re.findall(r'<a class="page-link" href="([^"]+)">(\w+)</a>', body):
+            if href != '#':
+                links[nav, text] = parse_qs(urlsplit(html.unescape(href)).query, keep_blank_values=True)
+    return links
+
+
+def test_profile_pagers_keep_each_others_position(app, client):
+    with app.app_context():
+        regular = db.session.execute(db.select(User.id).filter_by(username='regular')).scalar_one()
+        post_id = Post.query.filter_by(category='Buyers').first().id
+        db.session.add_all(Comment(post_id=post_id, user_id=regular, content=f'extra {i}', date=datetime(2024, 6, 1)) for i in range(5))
+        db.session.commit()
+    links = pager_links(client, '/profile/regular?after=&comments_page=2')
+    older = links['Post', 'Next']
+    assert older['comments_page'] == ['2']
+    comments = links['Comment', 'Previous']
+    assert comments['comments_page'] == ['1'] and comments['after'] == ['']
+    links = pager_links(client, '/profile/regular?after=' + older['after'][0])
+    assert links['Comment', 'Next']['after'] == older['after']
+    assert links['Post', 'Previous']['comments_page'] == ['1']
+    links = pager_links(client, '/profile/regular?page=2')
+    assert links['Comment', 'Next'] == {'page': ['2'], 'comments_page': ['2']}
@@ -0,0 +1,34 @@
+# tests/test_password_hashing.py
+import os
+import time
+
+import pytest
+
+from password_hashing import PasswordHasher, HashingBusy
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(rounds=4, workers=1, max_pending=1, timeout=0.5)
+    hasher.check(hasher.hash('pass123'), 'pass123')  # start the pool outside the timed calls
+    yield hasher
+    hasher.shutdown()
+
+
+def test_timed_out_job_keeps_its_slot_until_it_finishes(hasher):
+    hasher.timeout = 0.05
+    with pytest.raises(HashingBusy, match='timed out'):
+        hasher._run(time.sleep, 1)
+    with pytest.raises(HashingBusy, match='queue is full'):
+        hasher._run(abs, -1)
+    time.sleep(1.5)
+    hasher.timeout = 5
+    assert hasher._run(abs, -1) == 1
+
+
+def test_crashed_pool_is_replaced(hasher):
+    with pytest.raises(HashingBusy, match='restarted'):
+        hasher._run(os._exit, 1)
+    pw_hash = hasher.hash('pass123')
+    assert hasher.check(pw_hash, 'pass123')
+    assert not hasher.check(pw_hash, 'wrong')
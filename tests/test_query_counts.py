@@ -0,0 +1,31 @@
+# tests/test_query_counts.py
+"""Listing pages run a fixed number of statements, however many posts and authors they show."""
+import pytest
+
+import app as forum
+
+
+def page_statements(client, count_statements, url):
+    """Statements run to render url from cold page and user caches."""
+    forum.fragment_cache.clear()
+    forum.user_cache.clear()
+    with count_statements() as statements:
+        response = client.get(url)
+    assert response.status_code == 200
+    return statements
+
+
+@pytest.mark.parametrize('query', ['', '?page=1', '?after='])
+def test_category_page_statements_do_not_grow_with_posts(client, count_statements, query):
+    one_post = page_statements(client, count_statements, f'/category/marketplace/Sellers{query}')
+    ten_posts = page_statements(client, count_statements, f'/category/marketplace/Buyers{query}')
+    # Login loader, category counter, posts, comment counts, authors
+    assert len(one_post) == len(ten_posts) == 5
+
+
+@pytest.mark.parametrize('query', ['', '?after='])
+def test_profile_page_statements_do_not_grow_with_posts(client, count_statements, query):
+    one_post = page_statements(client, count_statements, f'/profile/newcomer{query}')
+    many_posts = page_statements(client, count_statements, f'/profile/regular{query}')
+    # Login loader, user, user counters, posts, comment counts, comments with their posts
+    assert len(one_post) == len(many_posts) == 6
@@ -0,0 +1,89 @@
+# tests/test_query_plans.py
+"""The listing queries walk their indexes in order: no table scans and no sorting in a temp B-tree.
+
+Each test captures the statement a page actually runs and asks SQLite for
+its plan with EXPLAIN QUERY PLAN.
+"""
+import pytest
+
+import app as forum
+from models import db, Post
+
+
+def captured(client, count_statements, url, table, order_by):
+    """The statement (and parameters) that url runs to list rows of table in order_by order."""
+    forum.fragment_cache.clear()
+    forum.user_cache.clear()
+    with count_statements() as statements:
+        response = client.get(url)
+    assert response.status_code == 200
+    matches = [(statement, parameters) for statement, parameters in statements
+               if f'FROM {table}' in statement and order_by in statement]
+    assert len(matches) == 1, f"expected one {table} listing query, got {len(matches)}"
+    return matches[0]
+
+
+def query_plan(app, statement, parameters):
+    with app.app_context():
+        rows = db.session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    return [row[-1] for row in rows]
+
+
+def assert_uses_index(plan, table, index):
+    assert any(f'SEARCH {table} USING INDEX {index}' in step for step in plan), plan
+    assert not any('USE TEMP B-TREE' in step for step in plan), plan
+    assert not any(step.startswith(f'SCAN {table}') for step in plan), plan
+
+
+@pytest.fixture
+def buyers_cursor(app):
+    """A keyset cursor a few posts into marketplace/Buyers."""
+    from pagination import encode_cursor
+    with app.app_context():
+        post = Post.query.filter_by(post_type='marketplace', category='Buyers').order_by(Post.date.desc()).offset(3).first()
+        return encode_cursor(post)
+
+
+@pytest.mark.parametrize('query', ['', '?page=2'])
+def test_category_listing_uses_category_date_index(app, client, count_statements, query):
+    statement = captured(client, count_statements, f'/category/marketplace/Buyers{query}', 'post', 'ORDER BY post.date DESC')
+    assert_uses_index(query_plan(app, *statement), 'post', 'ix_post_post_type_category_date')
+
+
+@pytest.mark.parametrize('direction, order_by', [('after', 'ORDER BY post.date DESC'), ('before', 'ORDER BY post.date ASC')])
+def test_category_keyset_page_uses_category_date_index(app, client, count_statements, buyers_cursor, direction, order_by):
+    url = f'/category/marketplace/Buyers?{direction}={buyers_cursor}'
+    statement = captured(client, count_statements, url, 'post', order_by)
+    assert_uses_index(query_plan(app, *statement), 'post', 'ix_post_post_type_category_date')
+
+
+def test_post_comments_use_post_date_index(app, client, count_statements):
+    with app.app_context():
+        post_id = Post.query.filter_by(post_type='marketplace', category='Buyers').first().id
+    statement = captured(client, count_statements, f'/post/marketplace/{post_id}', 'comment', 'ORDER BY comment.date DESC')
+    assert_uses_index(query_plan(app, *statement), 'comment', 'ix_comment_post_id_date')
+
+
+@pytest.mark.parametrize('query', ['', '?after='])
+def test_profile_posts_use_user_date_index(app, client, count_statements, query):
+    statement = captured(client, count_statements, f'/profile/regular{query}', 'post', 'ORDER BY post.date DESC')
+    assert_uses_index(query_plan(app, *statement), 'post', 'ix_post_user_id_date')
+
+
+def test_profile_comments_use_user_date_index(app, client, count_statements):
+    statement = captured(client, count_statements, '/profile/regular', 'comment', 'ORDER BY comment.date DESC')
+    assert_uses_index(query_plan(app, *statement), 'comment', 'ix_comment_user_id_date')
+
+
+@pytest.mark.parametrize('filters, index', [
+    ('type=marketplace&category=Buyers', 'ix_post_post_type_category_id'),
+    ('type=marketplace', 'ix_post_post_type_id'),
+])
+def test_filtered_change_feed_walks_id_ranges(app, client, count_statements, filters, index):
+    from api import encode_feed_cursor
+    url = f'/api/v1/changes?{filters}&cursor={encode_feed_cursor(0, 0)}'
+    posts = captured(client, count_statements, url, 'post', 'ORDER BY post.id')
+    assert_uses_index(query_plan(app, *posts), 'post', index)
+    comments = query_plan(app, *captured(client, count_statements, url, 'comment', 'ORDER BY comment.id'))
+    assert any('SEARCH comment USING INTEGER PRIMARY KEY' in step for step in comments), comments
+    assert not any('USE TEMP B-TREE' in step for step in comments), comments
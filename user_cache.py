@@ -0,0 +1,101 @@
+# user_cache.py
+from collections import OrderedDict
+from dataclasses import dataclass
+from flask_login import UserMixin
+from sqlalchemy import select
+from models import db, User
+import threading
+import time
+
+
+@dataclass(frozen=True, eq=False)
+class UserSnapshot(UserMixin):
+    """Read-only copy of the public fields of a User.
+
+    Safe to share between requests and threads: it is not attached to a
+    session, so using it never lazy-loads or refreshes. It carries no password
+    hash; views that need one (login) query the User model directly. Equality
+    is UserMixin's, by id.
+    """
+    id: int
+    username: str
+    avatar: str = None
+
+
+class UserCache:
+    """Bounded LRU of UserSnapshot by user id, with a TTL.
+
+    Serves Flask-Login's user loader and post author names without a query per
+    request. Flushes that update or delete a user drop its entry in this
+    process (see invalidate_flushed); other processes pick the change up when
+    their entry expires.
+    """
+
+    def __init__(self, maxsize=10000, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user_id):
+        """The snapshot for one user id, or None if there is no such user."""
+        return self.get_many([user_id]).get(user_id)
+
+    def get_many(self, user_ids):
+        """Snapshots for several user ids as {id: snapshot}, loading all misses in one query."""
+        now = time.monotonic()
+        found, missing = {}, set()
+        with self._lock:
+            for user_id in user_ids:
+                if user_id in found or user_id in missing:
+                    continue
+                entry = self._entries.get(user_id)
+                if entry is not None and entry[1] >= now:
+                    self._entries.move_to_end(user_id)
+                    found[user_id] = entry[0]
+                    self.hits += 1
+                else:
+                    missing.add(user_id)
+                    self.misses += 1
+        if not missing:
+            return found
+        rows = db.session.execute(select(User.id, User.username, User.avatar).where(User.id.in_(missing)))
+        loaded = {row.id: UserSnapshot(row.id, row.username, row.avatar) for row in rows}
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for user_id, snapshot in loaded.items():
+                self._entries[user_id] = (snapshot, expires)
+                self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        found.update(loaded)
+        return found
+
+    def invalidate(self, user_id):
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def invalidate_flushed(self, session, flush_context):
+        """after_flush listener: forget users that were changed or deleted."""
+        for obj in list(session.dirty) + list(session.deleted):
+            if isinstance(obj, User):
+                self.invalidate(obj.id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+            }